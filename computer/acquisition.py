@@ -0,0 +1,342 @@
+"""
+实时采集数据源
+
+原实现只能轮询 OpenBCI GUI 写入的录制文件，延迟受文件系统和 GUI 刷新节奏影响。
+这里把采集抽象为统一的数据源接口，每次 read() 返回自上次以来到达的样本块及其时间戳：
+
+- FileTailSource: 增量读取录制目录中最新的 OpenBCI-RAW 文件（原有方式）
+- UdpSource: 接收 OpenBCI GUI Networking 控件以 UDP 发送的 JSON 时间序列
+- LslSource: 通过 Lab Streaming Layer 接收（需要安装 pylsl）
+- SyntheticSource: 本地生成的合成脑电信号，用于无硬件时的测试
+
+时间戳统一为 time.time() 时钟（秒）。文件与 UDP 数据不带可用的采样时间，
+按到达时刻和采样率向前推算。
+"""
+
+import json
+import socket
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from openbci_reader import OpenBCITailReader
+from recording_watcher import RecordingWatcher, find_latest_recording
+from stage_timing import measure
+
+# 一个样本块: data 为 (样本数, 通道数)，timestamps 为 (样本数,)
+SampleBlock = namedtuple('SampleBlock', ['data', 'timestamps'])
+
+
+def arrival_timestamps(count, sample_rate, arrived_at=None):
+    """按到达时刻推算一块样本的时间戳（最后一个样本对应到达时刻）"""
+    if arrived_at is None:
+        arrived_at = time.time()
+    return arrived_at - (count - 1 - np.arange(count)) / sample_rate
+
+
+class AcquisitionSource:
+    """数据源接口"""
+
+    name = 'base'
+
+    def __init__(self, sample_rate):
+        """
+        :param sample_rate: 采样率 (Hz)
+        """
+        self.sample_rate = sample_rate
+        self.channel_count = 0
+        self.timings = None  # StageTimings，由使用方设置后记录文件发现与解析耗时
+
+    def open(self):
+        """连接数据源，失败时抛出异常"""
+
+    def read(self):
+        """
+        非阻塞读取新到达的样本
+        :return: SampleBlock，没有新数据时样本数为0
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """释放资源"""
+
+    def describe(self):
+        """数据源描述（用于日志）"""
+        return self.name
+
+    def _block(self, data, timestamps=None):
+        if timestamps is None:
+            timestamps = arrival_timestamps(len(data), self.sample_rate)
+        return SampleBlock(data, timestamps)
+
+    def _empty(self):
+        return SampleBlock(np.empty((0, self.channel_count)), np.empty(0))
+
+
+class FileTailSource(AcquisitionSource):
+    """增量读取 OpenBCI GUI 录制文件，录制文件轮换（新会话或新文件）时自动切换"""
+
+    name = 'file'
+
+    def __init__(self, sample_rate, recordings_dir, capacity, file_path=None, follow=True, log=None):
+        """
+        :param recordings_dir: OpenBCI 录制目录
+        :param capacity: 需要保留的样本数（首次打开大文件时只回读这么多行）
+        :param file_path: 指定文件，为None时使用最新的录制文件
+        :param follow: 是否跟随录制目录中出现的新文件
+        :param log: 日志函数
+        """
+        super().__init__(sample_rate)
+        self.recordings_dir = recordings_dir
+        self.capacity = capacity
+        self.file_path = file_path
+        self.follow = follow
+        self.log = log
+        self.reader = None
+        self.watcher = None
+        self.rotations = 0  # 已切换的文件数
+
+    def open(self):
+        if self.file_path is None:
+            with measure(self.timings, '文件发现'):
+                self.file_path = find_latest_recording(self.recordings_dir)
+        if not self.file_path:
+            raise FileNotFoundError("未找到有效数据文件，请确保OpenBCI设备已连接并生成数据")
+        self.reader = OpenBCITailReader(self.file_path, self.capacity)
+        if self.follow:
+            self.watcher = RecordingWatcher(self.recordings_dir, current=self.file_path)
+
+    def _rotate(self, new_path):
+        """
+        切换到新文件：先读完旧文件剩余的行，新文件从头读取，不丢样本
+        :return: 旧文件剩余的样本
+        """
+        remaining = self.reader.read_new()
+        self.file_path = new_path
+        # 新文件刚创建，OpenBCITailReader 从列名之后开始读取
+        self.reader = OpenBCITailReader(new_path, self.capacity)
+        self.rotations += 1
+        if self.log:
+            self.log(f"检测到新的录制文件，切换读取: {new_path}")
+        return remaining
+
+    def read(self):
+        parts = []
+        with measure(self.timings, '文件发现'):
+            new_path = self.watcher.check() if self.watcher else None
+        with measure(self.timings, '解析'):
+            if new_path and new_path != self.file_path:
+                parts.append(self._rotate(new_path))
+            parts.append(self.reader.read_new())
+        parts = [rows for rows in parts if len(rows)]
+        if len(parts) == 2 and parts[0].shape[1] != parts[1].shape[1]:
+            # 通道数不同（更换了设备），旧文件的剩余样本无法与新样本拼接，只保留新样本
+            parts = parts[1:]
+        self.channel_count = self.reader.channel_count
+        if not parts:
+            return self._empty()
+        return self._block(np.vstack(parts))
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+
+    def describe(self):
+        mode = f", 监视方式: {self.watcher.mode}" if self.watcher else ""
+        return f"文件 {self.file_path}{mode}"
+
+
+class UdpSource(AcquisitionSource):
+    """
+    接收 OpenBCI GUI Networking 控件的 UDP 输出（数据类型选 TimeSeries）
+
+    每个数据报为一个 JSON 对象：
+        {"type": "timeSeriesRaw", "data": [[通道0样本...], [通道1样本...], ...]}
+    旧版本 GUI 每个数据报只含一个样本: {"type": "eeg", "data": [ch0, ch1, ...]}
+    """
+
+    name = 'udp'
+    MAX_DATAGRAM = 65535
+
+    def __init__(self, sample_rate, host='127.0.0.1', port=12345):
+        super().__init__(sample_rate)
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.bad_packets = 0  # 无法解析的数据报数
+
+    def open(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.bind((self.host, self.port))
+        self.sock.setblocking(False)
+
+    def _parse(self, datagram):
+        """解析一个数据报为 (样本数, 通道数) 数组，无法解析时返回None"""
+        try:
+            packet = json.loads(datagram)
+            data = np.asarray(packet['data'], dtype=np.float64)
+        except (ValueError, KeyError, TypeError):
+            return None
+        if data.ndim == 1:
+            return data[np.newaxis, :]
+        if data.ndim == 2:
+            return data.T
+        return None
+
+    def read(self):
+        blocks = []
+        with measure(self.timings, '解析'):
+            while True:
+                try:
+                    datagram = self.sock.recv(self.MAX_DATAGRAM)
+                except (BlockingIOError, InterruptedError):
+                    break
+                rows = self._parse(datagram)
+                if rows is None or (blocks and rows.shape[1] != blocks[0].shape[1]):
+                    self.bad_packets += 1
+                    continue
+                blocks.append(rows)
+        if not blocks:
+            return self._empty()
+        data = np.vstack(blocks)
+        self.channel_count = data.shape[1]
+        return self._block(data)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def describe(self):
+        return f"UDP {self.host}:{self.port}"
+
+
+class LslSource(AcquisitionSource):
+    """通过 Lab Streaming Layer 接收 OpenBCI GUI 的 LSL 输出（需要 pylsl）"""
+
+    name = 'lsl'
+
+    def __init__(self, sample_rate, stream_type='EEG', resolve_timeout=5.0,
+                 correction_interval=30.0, correction_timeout=0.5):
+        """
+        :param stream_type: LSL 数据流类型
+        :param resolve_timeout: 查找数据流的超时 (秒)
+        :param correction_interval: 重新测量发送端时钟偏差的间隔 (秒)
+        :param correction_timeout: 单次测量时钟偏差的超时 (秒)
+        """
+        super().__init__(sample_rate)
+        self.stream_type = stream_type
+        self.resolve_timeout = resolve_timeout
+        self.correction_interval = correction_interval
+        self.correction_timeout = correction_timeout
+        self.inlet = None
+        self._clock_offset = 0.0  # time.time() 与 LSL 本地时钟之差
+        self._correction = 0.0  # 发送端时钟与本地 LSL 时钟之差
+        self._corrected_at = 0.0  # 上次测量时钟偏差的时间 (monotonic)
+
+    def open(self):
+        try:
+            import pylsl
+        except ImportError:
+            raise RuntimeError("LSL 数据源需要安装 pylsl: pip install pylsl")
+        streams = pylsl.resolve_byprop('type', self.stream_type, timeout=self.resolve_timeout)
+        if not streams:
+            raise RuntimeError(f"未找到类型为 {self.stream_type} 的 LSL 数据流")
+        self.inlet = pylsl.StreamInlet(streams[0], max_buflen=60)
+        self.channel_count = self.inlet.info().channel_count()
+        self._clock_offset = time.time() - pylsl.local_clock()
+        self._correction = 0.0
+        self._update_correction()
+
+    def _update_correction(self):
+        """
+        测量发送端时钟偏差（一次网络往返）：连接时测量一次，之后每 correction_interval 秒刷新，
+        超时或失败时沿用上次的值，不在采集循环中阻塞
+        """
+        self._corrected_at = time.monotonic()
+        try:
+            self._correction = self.inlet.time_correction(timeout=self.correction_timeout)
+        except Exception:
+            pass
+
+    def read(self):
+        with measure(self.timings, '解析'):
+            samples, timestamps = self.inlet.pull_chunk(timeout=0.0)
+            data = np.asarray(samples, dtype=np.float64)
+        if not samples:
+            return self._empty()
+        if time.monotonic() - self._corrected_at >= self.correction_interval:
+            self._update_correction()
+        return self._block(data, np.asarray(timestamps) + self._correction + self._clock_offset)
+
+    def close(self):
+        if self.inlet is not None:
+            self.inlet.close_stream()
+            self.inlet = None
+
+    def describe(self):
+        return f"LSL 类型 {self.stream_type}"
+
+
+class SyntheticSource(AcquisitionSource):
+    """按实际时间生成合成脑电：多频正弦叠加噪声，可随机注入NaN"""
+
+    name = 'synthetic'
+
+    def __init__(self, sample_rate, channels=8, nan_ratio=0.0, seed=None):
+        """
+        :param channels: 通道数
+        :param nan_ratio: 随机置为NaN的样本比例
+        :param seed: 随机种子
+        """
+        super().__init__(sample_rate)
+        self.channel_count = channels
+        self.nan_ratio = nan_ratio
+        self.rng = np.random.default_rng(seed)
+        self._start = None
+        self._emitted = 0  # 已生成的样本数
+        # 每个通道的 alpha (10Hz) 与 theta (6Hz) 节律幅值和相位
+        self._amplitude = self.rng.uniform(10, 40, size=(2, channels))
+        self._phase = self.rng.uniform(0, 2 * np.pi, size=(2, channels))
+
+    def open(self):
+        self._start = time.time()
+        self._emitted = 0
+
+    def generate(self, count):
+        """生成接下来的 count 个样本"""
+        t = (self._emitted + np.arange(count))[:, np.newaxis] / self.sample_rate
+        data = (self._amplitude[0] * np.sin(2 * np.pi * 10 * t + self._phase[0])
+                + self._amplitude[1] * np.sin(2 * np.pi * 6 * t + self._phase[1])
+                + self.rng.normal(0, 5, size=(count, self.channel_count)))
+        if self.nan_ratio:
+            data[self.rng.random(data.shape) < self.nan_ratio] = np.nan
+        self._emitted += count
+        return data
+
+    def read(self):
+        due = int((time.time() - self._start) * self.sample_rate)
+        count = due - self._emitted
+        if count <= 0:
+            return self._empty()
+        timestamps = self._start + (self._emitted + np.arange(count)) / self.sample_rate
+        return self._block(self.generate(count), timestamps)
+
+    def describe(self):
+        return f"合成信号 {self.channel_count}通道"
+
+
+def create_source(kind, sample_rate, **options):
+    """
+    按名称创建数据源
+    :param kind: 'file' / 'udp' / 'lsl' / 'synthetic'
+    :param options: 对应数据源的构造参数
+    """
+    sources = {cls.name: cls for cls in (FileTailSource, UdpSource, LslSource, SyntheticSource)}
+    if kind not in sources:
+        raise ValueError(f"不支持的数据源: {kind}")
+    return sources[kind](sample_rate, **options)
@@ -0,0 +1,223 @@
+"""
+HDF5 脑电文件批处理（无界面）
+
+对目录或通配符匹配到的 .h5 文件，使用进程池并行生成并上传波形图、向开发板传输文件，
+用于批量补录诊所的历史数据。每个文件的结果以 JSON Lines 写入清单文件；
+再次运行时使用 --resume 并指定同一个 --manifest，跳过清单中已成功的文件。
+
+示例：
+    python batch_process.py D:\\archive\\*.h5 --user-id 1001 --actions upload
+    python batch_process.py D:\\archive --user-from-dir --actions upload,transfer --workers 4
+    python batch_process.py D:\\archive --user-from-dir --manifest archive.jsonl --resume
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import offline
+from config import SERVER_URL, BOARD_HOST, BOARD_PORT, BOARD_TRANSFER_PROTOCOL
+from http_client import ApiClient
+
+ACTIONS = ('upload', 'transfer')
+
+# 工作进程内的共享对象（由 _init_worker 创建，每个进程一份）
+_client = None
+_transfer_lock = None
+
+
+def _init_worker(server_url, transfer_lock):
+    global _client, _transfer_lock
+    _client = ApiClient(server_url)
+    _transfer_lock = transfer_lock
+
+
+def process_file(path, user_id, actions, save_dir=None, board=None):
+    """
+    处理单个文件（在工作进程中运行）
+    :param board: 开发板参数 {'host', 'port', 'protocol'}
+    :return: 结果字典，写入清单
+    """
+    result = {'path': path, 'user_id': user_id, 'actions': list(actions), 'status': 'ok'}
+    start = time.perf_counter()
+    try:
+        if 'upload' in actions:
+            save_path = None
+            if save_dir:
+                save_path = os.path.join(save_dir, os.path.splitext(os.path.basename(path))[0] + '.png')
+            img_base64 = offline.render_waveform(path, save_path)
+            result['image_bytes'] = len(img_base64)
+            response = offline.upload_waveform(_client, offline.waveform_payload(user_id, img_base64))
+            result['upload_status'] = response.status_code
+            if response.status_code != 200:
+                raise RuntimeError(f"上传失败: {response.status_code} - {response.text[:200]}")
+        if 'transfer' in actions:
+            # 开发板一次只处理一个连接，传输在进程间串行
+            with _transfer_lock:
+                transfer = offline.send_to_board(path, user_id, log=None, **(board or {}))
+            result['transfer_bytes'] = transfer['bytes']
+            result['transfer_seconds'] = round(transfer['seconds'], 3)
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def collect_files(inputs):
+    """展开目录（递归查找 .h5）与通配符，去重并保持顺序"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, '**', '*.h5'), recursive=True)
+        else:
+            matches = glob.glob(item, recursive=True)
+        files.extend(sorted(matches))
+    return list(dict.fromkeys(os.path.abspath(f) for f in files))
+
+
+def resolve_user_id(path, default_user_id, from_dir):
+    """用户ID：--user-from-dir 时取上级目录名（需为数字），否则使用 --user-id"""
+    if from_dir:
+        name = os.path.basename(os.path.dirname(path))
+        if name.isdigit():
+            return int(name)
+    return default_user_id
+
+
+def load_done(manifest_path):
+    """读取清单中已成功处理的文件"""
+    done = set()
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('status') == 'ok':
+                done.add(record['path'])
+    return done
+
+
+def run(files, user_id, actions, workers, manifest_path, from_dir=False, save_dir=None,
+        server_url=SERVER_URL, board=None):
+    """
+    并行处理文件列表
+    :return: (成功数, 失败数)
+    """
+    total = len(files)
+    ok = failed = 0
+    start = time.perf_counter()
+    # 锁在创建工作进程时经 initializer 传入，不需要额外的 Manager 服务进程
+    transfer_lock = multiprocessing.Lock()
+    pending = iter(files)
+    in_flight = {}
+    # 最多同时提交 workers*2 个任务，避免大目录一次性排满队列
+    max_in_flight = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(server_url, transfer_lock)) as pool, \
+            open(manifest_path, 'a', encoding='utf-8') as manifest:
+        while True:
+            while len(in_flight) < max_in_flight:
+                path = next(pending, None)
+                if path is None:
+                    break
+                uid = resolve_user_id(path, user_id, from_dir)
+                in_flight[pool.submit(process_file, path, uid, actions, save_dir, board)] = path
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:  # 工作进程异常退出
+                    result = {'path': path, 'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+                manifest.write(json.dumps(result, ensure_ascii=False) + '\n')
+                manifest.flush()
+                if result['status'] == 'ok':
+                    ok += 1
+                else:
+                    failed += 1
+                done = ok + failed
+                elapsed = time.perf_counter() - start
+                eta = elapsed / done * (total - done)
+                detail = f"{result.get('seconds', 0):.1f}s" if result['status'] == 'ok' else result['error']
+                print(f"[{done}/{total}] {result['status']:6s} {os.path.basename(path)} ({detail})"
+                      f" | 成功 {ok} 失败 {failed} | 预计剩余 {eta:.0f}s", flush=True)
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0
+    print(f"完成: {total} 个文件, 成功 {ok}, 失败 {failed}, 耗时 {elapsed:.1f}s ({rate:.2f} 文件/秒)")
+    print(f"结果清单: {manifest_path}")
+    return ok, failed
+
+
+def positive_int(value):
+    """argparse 类型：不小于1的整数"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"需要不小于1的整数: {value}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HDF5 脑电文件批处理：生成并上传波形图、传输到开发板")
+    parser.add_argument('inputs', nargs='+', help="目录（递归查找 .h5）或通配符")
+    parser.add_argument('--user-id', type=int, help="所有文件使用的用户ID")
+    parser.add_argument('--user-from-dir', action='store_true', help="使用文件所在目录名作为用户ID")
+    parser.add_argument('--actions', default='upload', help="逗号分隔: upload,transfer")
+    parser.add_argument('--workers', type=positive_int, default=min(4, os.cpu_count() or 1), help="并行进程数")
+    parser.add_argument('--manifest', default=None, help="结果清单路径 (JSON Lines)")
+    parser.add_argument('--resume', action='store_true', help="跳过清单中已成功的文件（需要 --manifest）")
+    parser.add_argument('--save-dir', default=None, help="同时把波形图保存到该目录")
+    parser.add_argument('--server', default=SERVER_URL, help="服务器基础地址")
+    parser.add_argument('--board-host', default=BOARD_HOST, help="开发板地址")
+    parser.add_argument('--board-port', type=int, default=BOARD_PORT, help="开发板端口")
+    parser.add_argument('--protocol', default=BOARD_TRANSFER_PROTOCOL, choices=('legacy', 'resumable'),
+                        help="开发板传输协议")
+    args = parser.parse_args(argv)
+
+    actions = [a.strip() for a in args.actions.split(',') if a.strip()]
+    unknown = [a for a in actions if a not in ACTIONS]
+    if unknown or not actions:
+        parser.error(f"不支持的操作: {', '.join(unknown) or '(空)'}")
+    if args.user_id is None and not args.user_from_dir:
+        parser.error("需要 --user-id 或 --user-from-dir")
+    if args.resume and not args.manifest:
+        # 未指定清单时每次运行都会生成新的清单文件名，--resume 将什么也不跳过
+        parser.error("--resume 需要用 --manifest 指定上次运行的结果清单")
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+
+    manifest_path = args.manifest or f"batch_manifest_{time.strftime('%Y%m%d_%H%M%S')}.jsonl"
+    files = collect_files(args.inputs)
+    if args.resume:
+        done = load_done(manifest_path)
+        files = [f for f in files if f not in done]
+        print(f"跳过清单中已成功的 {len(done)} 个文件")
+    if args.user_from_dir and args.user_id is None:
+        missing = [f for f in files if resolve_user_id(f, None, True) is None]
+        if missing:
+            parser.error(f"{len(missing)} 个文件的目录名不是用户ID，例如 {missing[0]}；请同时指定 --user-id")
+    if not files:
+        print("没有需要处理的文件")
+        return 0
+
+    print(f"处理 {len(files)} 个文件, 操作: {','.join(actions)}, 并行进程: {args.workers}")
+    _, failed = run(files, args.user_id, actions, args.workers, manifest_path,
+                    args.user_from_dir, args.save_dir, args.server,
+                    {'host': args.board_host, 'port': args.board_port, 'protocol': args.protocol})
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+实时监测流水线基准测试（无需硬件）
+
+生成不同时长、通道数的合成 OpenBCI-RAW 录制文件（多频节律 + 噪声，可注入NaN），
+用本地桩服务器代替上传接口，按实际运行方式驱动 RealTimeMonitor 的各阶段：
+每个周期向文件追加一个刷新间隔的样本，再依次调用 read_latest_data（解析、NaN修复、滤波）、
+plot_waveforms（渲染、编码、base64）与上传，统计各阶段 p50/p95 与整体吞吐量。
+
+同时测量原实现每周期用 pandas 读取整个文件的耗时（安装了 pandas 时），
+用来对比随文件增大而线性增长的解析开销。--check 在解析耗时随文件大小明显增长时返回非零，
+可用于防止回退。
+
+示例：
+    python bench_realtime.py
+    python bench_realtime.py --minutes 1 10 60 --channels 16 --nan-ratio 0.01 --cycles 30
+    python bench_realtime.py --uplink-kbps 1000 --check
+"""
+
+import argparse
+import http.server
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import realtime_monitor
+from acquisition import SyntheticSource
+from http_client import ApiClient
+from pipeline import HopScheduler
+from realtime_monitor import RealTimeMonitor
+from stage_timing import StageTimings
+from upload_spool import UploadSpool, SpoolReplayer
+
+SAMPLE_RATE = realtime_monitor.REALTIME_SAMPLE_RATE
+WRITE_CHUNK = 50000  # 生成文件时每次写入的行数
+
+
+# ===================== 合成录制文件 =====================
+def _header(channels, sample_rate):
+    columns = (['Sample Index'] + [f'EXG Channel {i}' for i in range(channels)]
+               + [f'Accel Channel {i}' for i in range(3)] + ['Timestamp'])
+    return (f"%OpenBCI Raw EXG Data\n%Number of channels = {channels}\n%Sample Rate = {sample_rate} Hz\n"
+            f"%Board = OpenBCI_GUI$BoardCytonSerial\n" + ", ".join(columns) + "\n")
+
+
+def _rows(source, start_index, count, start_time):
+    """生成 count 行 CSV 文本（与 OpenBCI GUI 的列布局一致）"""
+    exg = source.generate(count)
+    index = (start_index + np.arange(count))[:, np.newaxis] % 256
+    accel = np.zeros((count, 3))
+    stamps = (start_time + (start_index + np.arange(count)) / source.sample_rate)[:, np.newaxis]
+    table = np.hstack([index, exg, accel, stamps])
+    fmt = ['%d'] + ['%.2f'] * (exg.shape[1] + 3) + ['%.3f']
+    lines = [', '.join(f % v for f, v in zip(fmt, row)) for row in table]
+    return '\n'.join(lines) + '\n'
+
+
+class SyntheticRecording:
+    """在录制目录中生成并持续追加合成 OpenBCI-RAW 文件"""
+
+    def __init__(self, directory, channels=8, sample_rate=SAMPLE_RATE, nan_ratio=0.001, seed=0):
+        """
+        :param directory: 录制目录（文件写入其中的 OpenBCISession_bench 子目录）
+        :param channels: EXG 通道数
+        :param nan_ratio: 随机置为NaN的样本比例
+        """
+        session = os.path.join(directory, 'OpenBCISession_bench')
+        os.makedirs(session, exist_ok=True)
+        self.path = os.path.join(session, f'OpenBCI-RAW-{channels}ch.txt')
+        self.source = SyntheticSource(sample_rate, channels, nan_ratio=nan_ratio, seed=seed)
+        self.start_time = time.time()
+        self.samples = 0
+        with open(self.path, 'w') as f:
+            f.write(_header(channels, sample_rate))
+
+    def append(self, count):
+        """追加 count 个样本"""
+        with open(self.path, 'a') as f:
+            for start in range(0, count, WRITE_CHUNK):
+                chunk = min(WRITE_CHUNK, count - start)
+                f.write(_rows(self.source, self.samples, chunk, self.start_time))
+                self.samples += chunk
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+
+# ===================== 本地桩服务器 =====================
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        server.requests += 1
+        server.bytes += len(body)
+        if server.uplink_bps:
+            time.sleep(len(body) * 8 / server.uplink_bps)  # 模拟上行带宽
+        reply = json.dumps({'success': True, 'deleted_count': 0}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    """接受任意 POST 并返回成功的本地服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, uplink_kbps=0):
+        """
+        :param uplink_kbps: 模拟的上行带宽 (kbit/s)，0 表示不限速
+        """
+        super().__init__(('127.0.0.1', 0), _StubHandler)
+        self.uplink_bps = uplink_kbps * 1000
+        self.requests = 0
+        self.bytes = 0
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}"
+
+
+# ===================== 基准测试 =====================
+def legacy_read(path, sample_count):
+    """原实现的读取方式：每周期用 pandas 读取整个文件后取最后 sample_count 行"""
+    import pandas as pd
+
+    df = pd.read_csv(path, comment='%')
+    exg_columns = [col for col in df.columns if 'EXG Channel' in col][:8]
+    return df[exg_columns].values[-sample_count:]
+
+
+def run_size(workdir, minutes, channels, nan_ratio, cycles, server, hop, legacy=True):
+    """
+    对一个文件大小运行若干周期
+    :return: 结果字典
+    """
+    recording = SyntheticRecording(workdir, channels, nan_ratio=nan_ratio)
+    recording.append(int(minutes * 60 * SAMPLE_RATE))
+
+    logs = []
+    client = ApiClient(server.url, log=logs.append)
+    spool = UploadSpool(os.path.join(workdir, 'spool.db'))
+    monitor = RealTimeMonitor(
+        1, logs.append, None, client=client, spool=spool,
+        replayer=SpoolReplayer(spool, client, RealTimeMonitor.generate_signature),
+        source_config={'kind': 'file', 'recordings_dir': workdir, 'file_path': recording.path, 'follow': False}
+    )
+    monitor.timings = StageTimings()
+    monitor.scheduler = HopScheduler(hop)
+    monitor.source = monitor.create_source()
+    monitor.source.timings = monitor.timings
+    monitor.source.open()
+
+    # 首次打开：定位列名并只回读文件尾部
+    start = time.perf_counter()
+    monitor.read_latest_data(realtime_monitor.REALTIME_SAMPLE_COUNT)
+    first_read = time.perf_counter() - start
+    monitor.timings = StageTimings()  # 首次打开单独统计，周期统计从零开始
+    monitor.source.timings = monitor.timings
+
+    legacy_time = None
+    if legacy:
+        try:
+            start = time.perf_counter()
+            legacy_read(recording.path, realtime_monitor.REALTIME_SAMPLE_COUNT)
+            legacy_time = time.perf_counter() - start
+        except ImportError:
+            pass
+
+    step = int(hop * SAMPLE_RATE)
+    cycle_times = []
+    for _ in range(cycles):
+        recording.append(step)  # OpenBCI GUI 在一个刷新间隔内追加的样本
+        start = time.perf_counter()
+        data = monitor.read_latest_data(realtime_monitor.REALTIME_SAMPLE_COUNT)
+        frame = monitor._render_stage({'data': data, 'captured_at': time.time()})
+        monitor._upload_stage(frame)
+        cycle_times.append(time.perf_counter() - start)
+
+    monitor.source.close()
+    spool.close()
+    client.close()
+    failures = [line for line in logs if '失败' in line or '异常' in line]
+    return {
+        'minutes': minutes,
+        'rows': recording.samples,
+        'megabytes': recording.size / 1e6,
+        'first_read': first_read,
+        'legacy_read': legacy_time,
+        'cycle_p50': float(np.median(cycle_times)),
+        'throughput': len(cycle_times) / sum(cycle_times),
+        'stages': monitor.timings.summary(),
+        'failures': failures,
+    }
+
+
+def report(results):
+    stage_names = []
+    for result in results:
+        stage_names += [s for s in result['stages'] if s not in stage_names]
+    print(f"\n{'时长':>6} {'行数':>9} {'文件MB':>8} {'首次打开':>8} {'pandas整读':>10} "
+          f"{'周期p50':>8} {'帧/秒':>6}  " + "  ".join(f"{s}(p50/p95)" for s in stage_names))
+    for r in results:
+        legacy = f"{r['legacy_read'] * 1000:8.0f}ms" if r['legacy_read'] is not None else f"{'-':>10}"
+        stages = "  ".join(
+            f"{r['stages'][s]['p50'] * 1000:.1f}/{r['stages'][s]['p95'] * 1000:.1f}" if s in r['stages'] else "-"
+            for s in stage_names)
+        print(f"{r['minutes']:>5g}m {r['rows']:>9d} {r['megabytes']:>8.1f} {r['first_read'] * 1000:>6.0f}ms "
+              f"{legacy} {r['cycle_p50'] * 1000:>6.0f}ms {r['throughput']:>6.2f}  {stages}")
+        for line in r['failures'][:3]:
+            print(f"    {line}")
+    print("单位: 毫秒；各阶段为每周期 p50/p95")
+
+
+def check_scaling(results, factor=3.0, slack=0.002):
+    """解析耗时不应随文件大小增长：最大文件的 p50 不超过最小文件的 factor 倍（加 slack 秒）"""
+    parse = [r['stages'].get('解析', {}).get('p50') for r in results]
+    if len(results) < 2 or None in parse:
+        return True
+    ok = parse[-1] <= parse[0] * factor + slack
+    print(f"解析耗时检查: {parse[0] * 1000:.2f}ms -> {parse[-1] * 1000:.2f}ms ({'通过' if ok else '失败'})")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="实时监测流水线基准测试（合成 OpenBCI 文件 + 本地桩服务器）")
+    parser.add_argument('--minutes', type=float, nargs='+', default=[1, 10, 30], help="录制文件时长 (分钟)")
+    parser.add_argument('--channels', type=int, default=8, help="EXG 通道数")
+    parser.add_argument('--nan-ratio', type=float, default=0.001, help="NaN 样本比例")
+    parser.add_argument('--cycles', type=int, default=20, help="每个文件大小运行的周期数")
+    parser.add_argument('--hop', type=float, default=1.0, help="每周期追加的数据时长 (秒)")
+    parser.add_argument('--uplink-kbps', type=float, default=0, help="桩服务器模拟的上行带宽，0 为不限速")
+    parser.add_argument('--no-legacy', action='store_true', help="不测量 pandas 整文件读取")
+    parser.add_argument('--json', default=None, help="把结果写入 JSON 文件")
+    parser.add_argument('--check', action='store_true', help="解析耗时随文件大小明显增长时返回非零")
+    args = parser.parse_args(argv)
+
+    # 预先导入实时监测中延迟导入的模块，避免计入第一个文件大小的首次打开与渲染耗时
+    import scipy.signal  # noqa: F401
+    import frame_encoder  # noqa: F401
+    import waveform_renderer  # noqa: F401
+
+    server = StubServer(args.uplink_kbps).start()
+    results = []
+    for minutes in sorted(args.minutes):
+        workdir = tempfile.mkdtemp(prefix='bench_realtime_')
+        try:
+            print(f"{minutes:g} 分钟, {args.channels} 通道 ...", flush=True)
+            results.append(run_size(workdir, minutes, args.channels, args.nan_ratio, args.cycles,
+                                    server, args.hop, legacy=not args.no_legacy))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    server.shutdown()
+
+    report(results)
+    print(f"桩服务器: {server.requests} 个请求, {server.bytes / 1e6:.1f}MB")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.check and not check_scaling(results):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,17 @@
+"""
+电脑端公共配置（GUI、实时监测与批处理共用）
+"""
+
+SERVER_URL = "https://epilepsy.host"  # 服务器基础地址
+API_KEY = "njunju"  # API认证密钥，需与服务器端IOT_PLATFORM_TOKEN一致
+
+# 离线波形图参数
+OFFLINE_PLOT_WIDTH = 12  # 图像宽度 (英寸)
+OFFLINE_PLOT_DPI = 100  # 分辨率，宽度 x 分辨率即包络的区间数
+OFFLINE_UPLOAD_PATH = "/api/upload-waveform"  # 离线波形图上传接口
+
+# 开发板文件传输参数
+BOARD_HOST = '192.168.137.100'  # 开发板IP
+BOARD_PORT = 5000  # 开发板端口
+# 'legacy' 为开发板现有固件使用的协议；'resumable' 为分块校验、可断点续传的 EPFT/1 协议
+BOARD_TRANSFER_PROTOCOL = 'legacy'
@@ -0,0 +1,104 @@
+"""
+大文件波形的分块最小/最大值包络
+
+原实现用 np.array(f['data'][:]) 把整个数据集读入内存，再逐点绘制每个通道的全部样本，
+录制越长内存与绘图耗时越大。图像宽度只有约 1200 个像素列，每列只需要该列内样本的
+最小值和最大值。这里按 h5py 切片分块读取数据集，把样本分配到与像素列对应的区间，
+逐块更新各区间的最小/最大值；内存与绘图耗时只与输出宽度有关，与录制时长无关。
+"""
+
+import numpy as np
+
+CHUNK_BYTES = 32 * 1024 * 1024  # 每次读取的数据量上限 (字节)
+
+
+def compute_envelope(dataset, bins, chunk_bytes=CHUNK_BYTES):
+    """
+    分块计算 (通道数, 样本数) 数据集的最小/最大值包络
+    :param dataset: h5py.Dataset 或 numpy 数组，形状为 (通道数, 样本数)
+    :param bins: 区间数（通常为图像宽度的像素列数）
+    :param chunk_bytes: 每块读取的字节数上限
+    :return: (区间边界样本索引 (bins+1,), 最小值 (通道数, bins), 最大值 (通道数, bins))；
+             样本数不超过 bins 时每个区间只含一个样本
+    """
+    channels, total = dataset.shape
+    bins = max(1, min(bins, total))
+    edges = (np.arange(bins + 1) * total) // bins
+    mins = np.full((channels, bins), np.nan)
+    maxs = np.full((channels, bins), np.nan)
+    chunk = max(1, chunk_bytes // (channels * 8))
+
+    for start in range(0, total, chunk):
+        stop = min(total, start + chunk)
+        block = np.asarray(dataset[:, start:stop], dtype=np.float64)
+        # 本块覆盖的区间及其在块内的起始位置（跨块的区间与之前的结果合并）
+        first = np.searchsorted(edges, start, side='right') - 1
+        last = np.searchsorted(edges, stop - 1, side='right') - 1
+        offsets = np.maximum(edges[first:last + 1], start) - start
+        covered = slice(first, last + 1)
+        # fmin/fmax 忽略NaN，整个区间都是NaN时结果为NaN
+        mins[:, covered] = np.fmin(mins[:, covered], np.fmin.reduceat(block, offsets, axis=1))
+        maxs[:, covered] = np.fmax(maxs[:, covered], np.fmax.reduceat(block, offsets, axis=1))
+
+    return edges, mins, maxs
+
+
+def plot_envelope(axes, edges, low, high, **kwargs):
+    """
+    在坐标轴上绘制单通道包络
+    :param edges: 区间边界样本索引
+    :param low: 各区间最小值
+    :param high: 各区间最大值
+    """
+    x = edges[:-1]
+    if edges[-1] - edges[0] <= len(x):
+        # 每个区间只有一个样本，直接绘制曲线
+        return axes.plot(x, low, **kwargs)
+    # 填充区域的边线保证只有一个像素高的区间也可见
+    return axes.fill_between(x, low, high, step='post', **kwargs)
+
+
+def _benchmark(channels=18, seconds=3600, sample_rate=256, bins=1200):
+    """对比整体读取逐点绘图与包络绘图的内存与耗时（使用临时 HDF5 文件）"""
+    import os
+    import tempfile
+    import time
+
+    import h5py
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    total = seconds * sample_rate
+    path = os.path.join(tempfile.mkdtemp(), 'bench.h5')
+    with h5py.File(path, 'w') as f:
+        ds = f.create_dataset('data', shape=(channels, total), dtype='f4', chunks=(channels, 65536))
+        rng = np.random.default_rng(0)
+        for start in range(0, total, 65536):
+            stop = min(total, start + 65536)
+            ds[:, start:stop] = rng.normal(0, 100, size=(channels, stop - start))
+
+    print(f"{channels}通道 x {seconds}秒 ({total}样本/通道)")
+    with h5py.File(path, 'r') as f:
+        start = time.perf_counter()
+        edges, mins, maxs = compute_envelope(f['data'], bins)
+        fig, axes = plt.subplots(channels, 1, figsize=(12, 3 * channels))
+        for ch, ax in enumerate(axes):
+            plot_envelope(ax, edges, mins[ch], maxs[ch], linewidth=0.5)
+        fig.savefig(os.devnull, format='png', dpi=100)
+        plt.close(fig)
+        print(f"包络: {time.perf_counter() - start:.2f}秒, 峰值数据 ~{mins.nbytes * 2 / 1e6:.1f}MB")
+
+        start = time.perf_counter()
+        data = np.array(f['data'][:])
+        fig, axes = plt.subplots(channels, 1, figsize=(12, 3 * channels))
+        for ch, ax in enumerate(axes):
+            ax.plot(data[ch], linewidth=0.5)
+        fig.savefig(os.devnull, format='png', dpi=100)
+        plt.close(fig)
+        print(f"整体读取逐点绘制: {time.perf_counter() - start:.2f}秒, 数据 {data.nbytes / 1e6:.1f}MB")
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,271 @@
+"""
+向开发板传输数据文件
+
+原实现先 f.read() 把整个文件读入内存，再通过一个 TCP 连接 sendall，中断后只能从头重传。
+
+- 原协议 (legacy)：开发板现有固件使用的格式，文本头 + 文件内容。这里改为 socket.sendfile
+  发送文件内容（Linux 上零拷贝，其他平台自动退化为分块发送），不再整体读入内存
+- 可续传协议 (EPFT/1)：文件按固定大小分块，每块带 CRC32；接收端只把校验通过的块写入
+  临时文件，连接建立时回复已确认的偏移，发送端从该偏移继续
+
+EPFT/1 交互流程：
+    发送端 -> 接收端  "EPFT/1\\nUSER_ID:..\\nFILE_NAME:..\\nFILE_SIZE:..\\nCHUNK_SIZE:..\\nTRANSFER_ID:..\\n\\n"
+    接收端 -> 发送端  "OFFSET:<已确认字节数>\\n"
+    发送端 -> 接收端  重复 [块头: 长度(uint32) CRC32(uint32)] [块数据]
+    接收端 -> 发送端  每块校验后 "ACK:<偏移>\\n"；校验失败 "ERR:<偏移>\\n" 并断开；全部完成 "DONE:<文件大小>\\n"
+
+本模块可直接运行：启动本地接收端并测试传输吞吐量与断点续传
+    python file_transfer.py --size 200
+"""
+
+import argparse
+import hashlib
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+import zlib
+
+PROTOCOL = 'EPFT/1'
+CHUNK_SIZE = 1024 * 1024  # 分块大小 (字节)
+_CHUNK_HEADER = struct.Struct('!II')  # 块长度, CRC32
+MAX_HEADER_BYTES = 4096
+
+
+class TransferError(Exception):
+    """传输失败（接收端拒绝或校验失败）"""
+
+
+def send_legacy(path, user_id, host, port, timeout=10):
+    """
+    原协议：文本头 + 文件内容，文件内容通过 sendfile 发送
+    :return: 发送的字节数
+    """
+    file_size = os.path.getsize(path)
+    header = f"USER_ID:{user_id}\nFILE_SIZE:{file_size}\n\n".encode('utf-8')
+    with socket.create_connection((host, port), timeout=timeout) as s:
+        s.sendall(header)
+        with open(path, 'rb') as f:
+            sent = s.sendfile(f)
+    return sent
+
+
+def transfer_id(path, user_id):
+    """同一用户的同一文件（名称、大小、修改时间相同）得到相同的传输ID，用于续传"""
+    stat = os.stat(path)
+    key = f"{user_id}|{os.path.basename(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _read_line(sock_file):
+    line = sock_file.readline(MAX_HEADER_BYTES)
+    if not line:
+        raise ConnectionError("连接已被接收端关闭")
+    return line.decode('utf-8').strip()
+
+
+class ResumableSender:
+    """EPFT/1 发送端：断线后自动重连并从接收端确认的偏移继续"""
+
+    def __init__(self, host, port, chunk_size=CHUNK_SIZE, timeout=10, retries=5, backoff=1.0, log=print):
+        """
+        :param host: 接收端地址
+        :param port: 接收端端口
+        :param chunk_size: 分块大小 (字节)
+        :param timeout: 套接字超时 (秒)
+        :param retries: 断线后最多重试次数
+        :param backoff: 重试等待时间基数 (秒)，每次翻倍
+        :param log: 日志函数
+        """
+        self.host = host
+        self.port = port
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.log = log
+
+    def send(self, path, user_id):
+        """
+        发送文件，中断后续传
+        :return: {'bytes': 文件大小, 'resumed_from': [各次连接的起始偏移], 'seconds': 耗时}
+        """
+        start = time.perf_counter()
+        resumed_from = []
+        attempt = 0
+        while True:
+            try:
+                offset = self._send_once(path, user_id, resumed_from)
+                return {'bytes': offset, 'resumed_from': resumed_from,
+                        'seconds': time.perf_counter() - start}
+            except (OSError, TransferError) as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                attempt += 1
+                if self.log:
+                    self.log(f"传输中断 ({e})，{delay:.1f}秒后第{attempt}次续传")
+                time.sleep(delay)
+
+    def _send_once(self, path, user_id, resumed_from):
+        file_size = os.path.getsize(path)
+        header = (f"{PROTOCOL}\nUSER_ID:{user_id}\nFILE_NAME:{os.path.basename(path)}\n"
+                  f"FILE_SIZE:{file_size}\nCHUNK_SIZE:{self.chunk_size}\n"
+                  f"TRANSFER_ID:{transfer_id(path, user_id)}\n\n")
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as s, \
+                s.makefile('rb') as replies, open(path, 'rb') as f:
+            s.sendall(header.encode('utf-8'))
+            reply = _read_line(replies)
+            if not reply.startswith('OFFSET:'):
+                raise TransferError(f"接收端拒绝: {reply}")
+            offset = int(reply.split(':', 1)[1])
+            resumed_from.append(offset)
+            if offset and self.log:
+                self.log(f"从 {offset}/{file_size} 字节处续传")
+
+            while offset < file_size:
+                length = min(self.chunk_size, file_size - offset)
+                f.seek(offset)
+                crc = zlib.crc32(f.read(length))
+                s.sendall(_CHUNK_HEADER.pack(length, crc))
+                s.sendfile(f, offset, length)
+                offset += length
+
+            # 接收端逐块回复 ACK，最后回复 DONE
+            while True:
+                reply = _read_line(replies)
+                if reply.startswith('DONE:'):
+                    return int(reply.split(':', 1)[1])
+                if reply.startswith('ERR:'):
+                    raise TransferError(f"块校验失败，偏移 {reply.split(':', 1)[1]}")
+
+
+class _ReceiverHandler(socketserver.StreamRequestHandler):
+    """EPFT/1 接收端连接处理"""
+
+    def handle(self):
+        server = self.server
+        fields = {}
+        first = _read_line(self.rfile)
+        if first != PROTOCOL:
+            self.wfile.write(b"ERR:protocol\n")
+            return
+        while True:
+            line = _read_line(self.rfile)
+            if not line:
+                break
+            key, _, value = line.partition(':')
+            fields[key] = value
+        file_size = int(fields['FILE_SIZE'])
+        chunk_size = int(fields['CHUNK_SIZE'])
+        tid = fields['TRANSFER_ID']
+        name = os.path.basename(fields['FILE_NAME'])
+        part_path = os.path.join(server.directory, f"{tid}.part")
+
+        # 临时文件中只有校验通过的完整块
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        offset -= offset % chunk_size if offset < file_size else 0
+        self.wfile.write(f"OFFSET:{offset}\n".encode('ascii'))
+
+        with open(part_path, 'r+b' if os.path.exists(part_path) else 'wb') as part:
+            part.truncate(offset)
+            part.seek(offset)
+            while offset < file_size:
+                header = self.rfile.read(_CHUNK_HEADER.size)
+                if len(header) < _CHUNK_HEADER.size:
+                    return  # 发送端断开，保留已确认的部分
+                length, crc = _CHUNK_HEADER.unpack(header)
+                data = self.rfile.read(length)
+                if len(data) < length:
+                    return
+                if server.corrupt_at == offset:
+                    server.corrupt_at = None
+                    data = b'\0' + data[1:]
+                if zlib.crc32(data) != crc:
+                    self.wfile.write(f"ERR:{offset}\n".encode('ascii'))
+                    return
+                part.write(data)
+                offset += length
+                self.wfile.write(f"ACK:{offset}\n".encode('ascii'))
+                if server.drop_after is not None and offset >= server.drop_after:
+                    server.drop_after = None
+                    return  # 测试用：模拟连接中断
+
+        final_path = os.path.join(server.directory, f"{fields.get('USER_ID', '')}_{name}")
+        os.replace(part_path, final_path)
+        server.completed.append(final_path)
+        self.wfile.write(f"DONE:{offset}\n".encode('ascii'))
+
+
+class LocalReceiver(socketserver.ThreadingTCPServer):
+    """本地 EPFT/1 接收端（代替开发板进行测试）"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, directory, host='127.0.0.1', port=0):
+        """
+        :param directory: 接收文件保存目录
+        :param port: 监听端口，0 表示自动分配
+        """
+        super().__init__((host, port), _ReceiverHandler)
+        self.directory = directory
+        self.completed = []  # 已完成的文件路径
+        self.drop_after = None  # 测试用：收到该偏移后断开一次
+        self.corrupt_at = None  # 测试用：篡改该偏移处的块一次
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def _throughput_test(size_mb):
+    import tempfile
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'test.h5')
+    with open(path, 'wb') as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(size_mb):
+            f.write(block)
+
+    receiver = LocalReceiver(os.path.join(workdir, 'received')).start()
+    host, port = receiver.server_address
+    sender = ResumableSender(host, port, backoff=0.1)
+
+    result = sender.send(path, 1)
+    print(f"EPFT/1 {size_mb}MB: {result['seconds']:.2f}秒, {size_mb / result['seconds']:.0f}MB/s")
+
+    # 断点续传：传到一半断开，再注入一个校验错误
+    os.utime(path)  # 修改时间变化，得到新的传输ID
+    receiver.drop_after = size_mb // 2 * 1024 * 1024
+    receiver.corrupt_at = (size_mb * 3 // 4) * 1024 * 1024
+    result = sender.send(path, 1)
+    with open(path, 'rb') as a, open(receiver.completed[-1], 'rb') as b:
+        intact = a.read() == b.read()
+    print(f"中断与校验失败后续传: 各次起始偏移 {result['resumed_from']}, 文件一致: {intact}")
+
+    # 原协议（本地接收并丢弃）
+    sink = socket.create_server(('127.0.0.1', 0))
+
+    def drain():
+        conn, _ = sink.accept()
+        with conn:
+            while conn.recv(1 << 20):
+                pass
+
+    threading.Thread(target=drain, daemon=True).start()
+    start = time.perf_counter()
+    send_legacy(path, 1, *sink.getsockname())
+    elapsed = time.perf_counter() - start
+    print(f"原协议 (sendfile) {size_mb}MB: {elapsed:.2f}秒, {size_mb / elapsed:.0f}MB/s")
+    receiver.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="文件传输吞吐量与续传测试")
+    parser.add_argument('--size', type=int, default=200, help="测试文件大小 (MB)")
+    _throughput_test(parser.parse_args().size)
@@ -0,0 +1,177 @@
+"""
+波形图编码与带宽预算
+
+原实现把每帧 1500x1800 的画布直接以默认参数编码为真彩色PNG（约350KB，编码约100ms），
+再经base64在移动网络上上传。波形图实际只有少量颜色（背景、曲线、网格、文字及其抗锯齿过渡），
+这里先量化为小调色板（复用上一帧的调色板约10ms），再按每帧字节预算选择格式与压缩级别：
+
+- 质量档位：(像素尺寸比例, 调色板颜色数)，超出预算时降档，连续明显低于预算时升档
+- 每个档位内依次尝试 PNG 快速压缩、PNG 标准压缩、WebP 无损（启用时），取第一个满足预算的结果
+- 上传耗时超过刷新间隔时收紧预算，上传恢复后逐步放宽到配置值
+
+小程序按 data:image/png 显示波形图，WebP 默认不启用，确认客户端支持后再加入 formats。
+"""
+
+import time
+from collections import namedtuple
+from io import BytesIO
+
+from PIL import Image
+
+FRAME_BUDGET = 100 * 1024  # 每帧字节预算（编码后、base64之前）
+MIN_BUDGET = 24 * 1024  # 上传慢时预算的下限
+# 质量档位 (像素尺寸比例, 调色板颜色数)，从高到低
+LEVELS = [(1.0, 32), (1.0, 16), (1.0, 8), (0.75, 16), (0.75, 8), (0.5, 8), (0.5, 4)]
+# 档位内依次尝试的编码参数 (格式, 参数)
+CANDIDATES = [('png', {'compress_level': 1}), ('png', {'compress_level': 6}),
+              ('webp', {'lossless': True, 'method': 0})]
+PALETTE_REFRESH = 50  # 每隔多少帧重新计算调色板
+UPGRADE_AFTER = 10  # 连续多少帧低于预算一半时升档
+
+# 一帧的编码结果: data 为图像字节, seconds 为量化与编码总耗时
+EncodedFrame = namedtuple('EncodedFrame', ['data', 'format', 'seconds', 'scale', 'colors'])
+
+
+class FrameEncoder:
+    """按字节预算量化并编码波形图"""
+
+    def __init__(self, budget=FRAME_BUDGET, formats=('png',), min_budget=MIN_BUDGET, levels=LEVELS):
+        """
+        :param budget: 每帧字节预算
+        :param formats: 允许的格式，'png' 和/或 'webp'
+        :param min_budget: 上传慢时预算的下限
+        :param levels: 质量档位列表 (像素尺寸比例, 调色板颜色数)
+        """
+        self.target_budget = budget
+        self.budget = budget
+        self.min_budget = min(min_budget, budget)
+        self.formats = tuple(formats)
+        self.levels = levels
+        self.level = 0
+        self._first = 0  # 当前档位上一帧满足预算的编码参数，下一帧从它开始尝试
+        self._candidates = [c for c in CANDIDATES if c[0] in self.formats]
+        self._palettes = {}  # 颜色数 -> (调色板图像, 已使用的帧数)
+        self._under_budget = 0  # 连续低于预算一半的帧数
+        self._buffer = BytesIO()
+
+    @property
+    def scale(self):
+        """当前档位的像素尺寸比例（由调用方按此比例渲染画布）"""
+        return self.levels[self.level][0]
+
+    @property
+    def colors(self):
+        return self.levels[self.level][1]
+
+    def _quantize(self, image, colors):
+        """量化为调色板图像；波形图配色固定，调色板跨帧复用"""
+        palette, used = self._palettes.get(colors, (None, 0))
+        if palette is None or used >= PALETTE_REFRESH:
+            palette = image.quantize(colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+            self._palettes[colors] = (palette, 1)
+            return palette
+        self._palettes[colors] = (palette, used + 1)
+        return image.quantize(palette=palette, dither=Image.Dither.NONE)
+
+    def _save(self, image, fmt, options):
+        buffer = self._buffer
+        buffer.seek(0)
+        buffer.truncate()
+        if fmt == 'webp':
+            image = image.convert('RGB')  # Pillow 的 WebP 编码器不接受调色板图像
+        image.save(buffer, format=fmt.upper(), **options)
+        return buffer.getvalue()
+
+    def encode(self, image):
+        """
+        量化并编码一帧
+        :param image: PIL RGB 图像（按 scale 渲染）
+        :return: EncodedFrame；所有参数都超出预算时返回最小的结果，并在下一帧降档
+        """
+        start = time.perf_counter()
+        scale, colors = self.levels[self.level]
+        quantized = self._quantize(image, colors)
+        best = None
+        for index in range(self._first, len(self._candidates)):
+            fmt, options = self._candidates[index]
+            data = self._save(quantized, fmt, options)
+            if best is None or len(data) < len(best[0]):
+                best = (data, fmt)
+            if len(data) <= self.budget:
+                self._first = index
+                break
+        data, fmt = best
+        self._adjust_level(len(data))
+        return EncodedFrame(data, fmt, time.perf_counter() - start, scale, colors)
+
+    def _adjust_level(self, size):
+        level = self.level
+        if size > self.budget:
+            level = min(level + 1, len(self.levels) - 1)
+            self._under_budget = 0
+        elif size < self.budget / 2:
+            self._under_budget += 1
+            if self._under_budget >= UPGRADE_AFTER:
+                # 先改用更快的编码参数，已是最快参数时再升档
+                if self._first > 0:
+                    self._first -= 1
+                else:
+                    level = max(level - 1, 0)
+                self._under_budget = 0
+        else:
+            self._under_budget = 0
+        if level != self.level:
+            self.level = level
+            self._first = 0
+
+    def observe_upload(self, seconds, interval):
+        """
+        根据上传耗时调整预算
+        :param seconds: 本帧上传耗时 (秒)
+        :param interval: 当前刷新间隔 (秒)
+        :return: 预算发生变化时返回True
+        """
+        previous = self.budget
+        if seconds > interval * 0.8:
+            # 上传跟不上刷新：按耗时超出的比例收紧预算
+            self.budget = max(self.min_budget, int(self.budget * min(0.7, interval * 0.8 / seconds)))
+        elif seconds < interval * 0.3 and self.budget < self.target_budget:
+            self.budget = min(self.target_budget, int(self.budget * 1.2))
+        return self.budget != previous
+
+
+def _benchmark(channels=8, frames=30):
+    """对比真彩色PNG与按预算编码的字节数与耗时"""
+    from acquisition import SyntheticSource
+    from waveform_renderer import WaveformRenderer
+
+    source = SyntheticSource(250, channels, seed=0)
+    source.open()
+    renderer = WaveformRenderer(channels, 1250, 250)
+    renderer.draw(source.generate(1250))
+    start = time.perf_counter()
+    buffer = BytesIO()
+    renderer.to_image().save(buffer, format='PNG')
+    print(f"真彩色PNG {renderer.to_image().size}: {len(buffer.getvalue()) / 1024:.0f}KB, "
+          f"编码 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    for budget in (FRAME_BUDGET, 40 * 1024):
+        for formats in (('png',), ('png', 'webp')):
+            encoder = FrameEncoder(budget, formats)
+            renderers = {}
+            sizes, seconds = [], []
+            for _ in range(frames):
+                scale = encoder.scale
+                if scale not in renderers:
+                    renderers[scale] = WaveformRenderer(channels, 1250, 250, dpi=100 * scale)
+                renderers[scale].draw(source.generate(1250))
+                frame = encoder.encode(renderers[scale].to_image())
+                sizes.append(len(frame.data))
+                seconds.append(frame.seconds)
+            print(f"预算 {budget / 1024:.0f}KB {'/'.join(formats)}: 稳定后 {sizes[-1] / 1024:.0f}KB "
+                  f"({frame.format}, 比例 {frame.scale}, {frame.colors}色), "
+                  f"平均编码 {sum(seconds) / frames * 1000:.0f}ms, 超出预算 {sum(s > budget for s in sizes)} 帧")
+
+
+if __name__ == '__main__':
+    _benchmark()
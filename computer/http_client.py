@@ -0,0 +1,115 @@
+"""
+共享的 HTTP 客户端
+
+原实现每次上传都调用模块级 requests.post，每 5 秒新建一次 TCP+TLS 连接。
+这里所有请求共用一个 requests.Session：连接池保持长连接 (keep-alive)，
+之后的请求省去 TCP 握手与 TLS 握手的往返。
+
+对连接错误、超时和 5xx 响应按指数退避 + 随机抖动重试；签名头每次尝试重新生成
+（服务器会拒绝重复的 Nonce）。每次请求记录耗时与重试次数。
+"""
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = 4  # 每个主机保持的连接数
+CONNECT_TIMEOUT = 3.05  # 建立连接超时 (秒)
+RETRY_STATUS = frozenset({500, 502, 503, 504})  # 可重试的状态码
+
+
+def create_session(pool_size=POOL_SIZE):
+    """创建带连接池的会话（重试由 ApiClient 自行处理，适配器不重试）"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class ApiClient:
+    """带重试、退避与耗时统计的 JSON POST 客户端，可在多个线程间共享"""
+
+    def __init__(self, base_url, session=None, retries=3, backoff=0.5, max_backoff=8.0, log=None):
+        """
+        :param base_url: 服务器基础地址
+        :param session: 共享的 requests.Session，为None时新建
+        :param retries: 最多重试次数（不含首次请求）
+        :param backoff: 首次重试前的基础等待时间 (秒)，之后每次翻倍
+        :param max_backoff: 单次等待时间上限 (秒)
+        :param log: 日志函数
+        """
+        self.base_url = base_url.rstrip('/')
+        self.session = session or create_session()
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.log = log
+        self._lock = threading.Lock()
+        self.request_count = 0  # 完成的请求数（含失败）
+        self.retry_count = 0  # 累计重试次数
+        self.total_time = 0.0  # 累计耗时 (秒)
+        self.last_elapsed = None  # 最近一次请求耗时 (秒)
+
+    def _delay(self, attempt):
+        """第 attempt 次重试前的等待时间（全抖动）"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def post(self, path, payload, headers=None, timeout=5, deadline=None):
+        """
+        发送 JSON POST 请求
+        :param path: 接口路径，如 '/api/realtime-upload-waveform'
+        :param payload: JSON 负载
+        :param headers: 请求头字典，或每次尝试调用一次以生成新签名的函数
+        :param timeout: 读取超时 (秒)
+        :param deadline: 整个请求（含重试）的截止时间 (time.monotonic())，超过后不再重试
+        :return: requests.Response（重试用尽时为最后一次的 5xx 响应）
+        :raises requests.RequestException: 重试用尽后仍连接失败或超时
+        """
+        url = f"{self.base_url}{path}"
+        start = time.monotonic()
+        attempt = 0
+        try:
+            while True:
+                request_headers = headers() if callable(headers) else headers
+                try:
+                    response = self.session.post(url, json=payload, headers=request_headers,
+                                                 timeout=(CONNECT_TIMEOUT, timeout))
+                    if response.status_code not in RETRY_STATUS:
+                        return response
+                    error = None
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    response, error = None, e
+
+                delay = self._delay(attempt)
+                if attempt >= self.retries or (deadline is not None and time.monotonic() + delay >= deadline):
+                    if error is not None:
+                        raise error
+                    return response
+                attempt += 1
+                if self.log:
+                    reason = response.status_code if response is not None else type(error).__name__
+                    self.log(f"请求 {path} 失败 ({reason})，{delay:.2f}秒后第{attempt}次重试")
+                time.sleep(delay)
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.request_count += 1
+                self.retry_count += attempt
+                self.total_time += elapsed
+                self.last_elapsed = elapsed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.request_count,
+                'retries': self.retry_count,
+                'avg_time': self.total_time / self.request_count if self.request_count else None,
+                'last_time': self.last_elapsed
+            }
+
+    def close(self):
+        self.session.close()
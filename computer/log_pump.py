@@ -0,0 +1,112 @@
+"""
+日志窗口的线程安全批量输出
+
+原实现中 TextRedirector.write() 与 log_message() 在调用线程里直接操作 ScrolledText，
+并且每写一行都调用 widget.update() 强制执行一轮完整的 Tk 事件循环：
+- Tk 组件只能在主线程中访问，监测线程与处理线程直接写入并不安全
+- 日志较多时（例如逐通道的NaN警告）每行一次 update() 会明显拖慢采集与处理线程
+- 日志框内容无限增长，长时间运行后插入与滚动越来越慢
+
+这里改为：任意线程只把文本放入队列，立即返回；主线程通过 after() 定时取出，
+把连续的同样式文本合并为一次插入，并只保留最后 max_lines 行。
+"""
+
+import queue
+import tkinter as tk
+
+FLUSH_INTERVAL_MS = 100  # 主线程取出日志的间隔 (毫秒)
+MAX_LINES = 2000  # 日志框保留的最大行数
+MAX_BATCH = 5000  # 每次最多取出的日志条数，避免积压时长时间占用主线程
+
+
+class LogPump:
+    """后台线程写入队列，Tk 主线程按批取出并写入文本框"""
+
+    def __init__(self, widget, interval_ms=FLUSH_INTERVAL_MS, max_lines=MAX_LINES, max_batch=MAX_BATCH):
+        """
+        :param widget: Text / ScrolledText 组件
+        :param interval_ms: 取出间隔 (毫秒)
+        :param max_lines: 文本框保留的最大行数，超出时删除最早的行
+        :param max_batch: 每次最多取出的条数
+        """
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.max_lines = max_lines
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._after_id = None
+
+    def write(self, text, tag=None):
+        """写入文本（任意线程可调用，不访问Tk组件）"""
+        if text:
+            self._queue.put((text, tag))
+
+    def start(self):
+        """开始定时取出（在主线程调用）"""
+        if self._after_id is None:
+            self._after_id = self.widget.after(self.interval_ms, self._drain)
+        return self
+
+    def stop(self):
+        """停止定时取出，并写入队列中剩余的日志"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        self.flush()
+
+    def flush(self):
+        """立即取出队列中的日志（在主线程调用）"""
+        batch = []
+        try:
+            while len(batch) < self.max_batch:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        if batch:
+            self._insert(batch)
+        return len(batch)
+
+    def _drain(self):
+        try:
+            self.flush()
+        except tk.TclError:
+            return  # 窗口已销毁
+        self._after_id = self.widget.after(self.interval_ms, self._drain)
+
+    def _insert(self, batch):
+        # 合并连续的同样式文本，减少插入次数
+        runs = []
+        for text, tag in batch:
+            if runs and runs[-1][1] == tag:
+                runs[-1][0].append(text)
+            else:
+                runs.append(([text], tag))
+
+        widget = self.widget
+        widget.configure(state="normal")  # 临时启用编辑
+        for texts, tag in runs:
+            widget.insert(tk.END, ''.join(texts), (tag,) if tag else ())
+        lines = int(widget.index('end-1c').split('.')[0])
+        if lines > self.max_lines:
+            widget.delete('1.0', f'{lines - self.max_lines + 1}.0')
+        widget.see(tk.END)  # 滚动到末尾
+        widget.configure(state="disabled")  # 恢复禁用状态
+
+
+class LogStream:
+    """把 sys.stdout / sys.stderr 的写入转发到 LogPump"""
+
+    def __init__(self, pump, tag="stdout"):
+        """
+        :param pump: LogPump 实例
+        :param tag: 文本标签 (stdout/stderr)
+        """
+        self.pump = pump
+        self.tag = tag
+
+    def write(self, text):
+        self.pump.write(text, self.tag)
+        return len(text)
+
+    def flush(self):
+        """兼容文件接口的空方法（由主线程定时刷新）"""
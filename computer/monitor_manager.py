@@ -0,0 +1,203 @@
+"""
+多患者实时监测管理
+
+原来一个 EpilepsyApp 只持有一个 RealTimeMonitor，病房里一台电脑连接多块 OpenBCI 板时
+需要为每名患者各启动一个进程，每个进程都重新导入 scipy/matplotlib，各自运行渲染与上传线程。
+
+MonitorManager 在一个进程中运行 N 条患者流水线：
+- 采集按板卡独立：每名患者一个采集线程和自己的数据源（录制目录、UDP 端口或 LSL 流）
+- 渲染/推理与上传使用共享线程池 (SharedStagePool)，线程数与患者数无关
+- 所有患者共用一个 HTTP 长连接会话、上传暂存队列与补传线程
+- 线程池按轮转顺序服务各患者，每名患者每个阶段同一时刻最多占用一个线程，
+  单个患者渲染或上传慢只会降低其自身的刷新率（由其步长调度器自动降级），不会饿死其他患者
+
+独立运行：
+    python monitor_manager.py --patient 1001:udp:12345 --patient 1002:udp:12346
+    python monitor_manager.py --patient 1001:file:D:\\Recordings\\board1 --patient 1002:synthetic
+"""
+
+import argparse
+import signal
+import threading
+import time
+
+from config import SERVER_URL
+from http_client import ApiClient, create_session
+from pipeline import SharedStagePool
+from realtime_monitor import RealTimeMonitor
+from upload_spool import UploadSpool, SpoolReplayer
+
+CPU_WORKERS = 2  # 渲染/推理线程数
+UPLOAD_WORKERS = 3  # 上传线程数
+
+
+def parse_patient(spec):
+    """
+    解析患者参数 "用户ID[:数据源[:参数]]"
+    - udp 的参数为端口或 host:port
+    - file 的参数为录制目录
+    - lsl 的参数为数据流类型
+    :return: (用户ID, 数据源配置)
+    """
+    user_id, _, rest = spec.partition(':')
+    kind, _, argument = rest.partition(':')
+    config = {'kind': kind} if kind else {}
+    if argument:
+        if kind == 'udp':
+            host, _, port = argument.rpartition(':')
+            config['port'] = int(port)
+            if host:
+                config['host'] = host
+        elif kind == 'file':
+            config['recordings_dir'] = argument
+        elif kind == 'lsl':
+            config['stream_type'] = argument
+        else:
+            raise ValueError(f"数据源 {kind} 不接受参数: {argument}")
+    return int(user_id), config
+
+
+class MonitorManager:
+    """在一个进程中管理多名患者的实时监测"""
+
+    def __init__(self, log_callback=None, status_callback=None, server_url=SERVER_URL,
+                 cpu_workers=CPU_WORKERS, upload_workers=UPLOAD_WORKERS):
+        """
+        :param log_callback: 日志回调函数（消息已带患者前缀）
+        :param status_callback: 汇总状态回调函数
+        :param server_url: 服务器基础地址
+        :param cpu_workers: 共享渲染/推理线程数
+        :param upload_workers: 共享上传线程数
+        """
+        self.log_callback = log_callback
+        self.status_callback = status_callback
+        # 连接池容纳所有上传线程、状态上报与补传线程的并发请求
+        self.client = ApiClient(server_url, session=create_session(pool_size=upload_workers + cpu_workers + 1),
+                                log=self.log)
+        self.spool = UploadSpool()
+        self.replayer = SpoolReplayer(self.spool, self.client, RealTimeMonitor.generate_signature, log=self.log)
+        self.cpu_pool = SharedStagePool("渲染", cpu_workers, self.log)
+        self.upload_pool = SharedStagePool("上传", upload_workers, self.log)
+        self.monitors = {}  # 用户ID -> RealTimeMonitor
+        self._lock = threading.Lock()
+        self._started = False
+
+    def log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+
+    def _start_shared(self):
+        if not self._started:
+            self.cpu_pool.start()
+            self.upload_pool.start()
+            self.replayer.start()
+            self._started = True
+
+    def add(self, user_id, source_config=None):
+        """
+        添加并启动一名患者的监测
+        :param source_config: 数据源配置 {'kind': 'udp', 'port': 12346} 等，为None时使用 REALTIME_* 配置
+        """
+        with self._lock:
+            if user_id in self.monitors:
+                self.log(f"患者 {user_id} 已在监测中")
+                return self.monitors[user_id]
+            self._start_shared()
+            monitor = RealTimeMonitor(
+                user_id,
+                log_callback=lambda message: self.log(f"[患者 {user_id}] {message}"),
+                status_callback=lambda status: self._on_status(user_id, status),
+                client=self.client,
+                spool=self.spool,
+                replayer=self.replayer,
+                source_config=source_config,
+                cpu_pool=self.cpu_pool,
+                upload_pool=self.upload_pool
+            )
+            self.monitors[user_id] = monitor
+        monitor.start()
+        return monitor
+
+    def remove(self, user_id):
+        """停止并移除一名患者的监测"""
+        with self._lock:
+            monitor = self.monitors.pop(user_id, None)
+        if monitor:
+            monitor.stop()
+
+    def stop(self):
+        """停止所有患者的监测与共享线程"""
+        for user_id in list(self.monitors):
+            self.remove(user_id)
+        if self._started:
+            self.cpu_pool.stop()
+            self.upload_pool.stop()
+            self.replayer.stop()
+            self._started = False
+        self.client.close()
+
+    def _on_status(self, user_id, status):
+        """患者监测启动或停止时汇总通知"""
+        with self._lock:
+            if user_id not in self.monitors:
+                return
+        if self.status_callback:
+            self.status_callback(self.status())
+
+    def status(self):
+        """各患者的流水线状态，每名患者一行（调用方定时读取）"""
+        with self._lock:
+            monitors = sorted(self.monitors.items())
+        return "\n".join(f"患者 {user_id}: {monitor.pipeline_status()}" for user_id, monitor in monitors)
+
+    def stage_stats(self):
+        """共享线程池中各患者阶段的处理数、积压与平均耗时"""
+        return self.cpu_pool.stats() + self.upload_pool.stats()
+
+
+# ===================== 独立运行（无界面） =====================
+def _timestamped(message):
+    print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多患者实时脑电监测服务（无界面）")
+    parser.add_argument('--patient', action='append', required=True,
+                        help="用户ID[:数据源[:参数]]，可重复，例如 1001:udp:12345、1002:file:目录、1003:synthetic")
+    parser.add_argument('--server', default=SERVER_URL, help="服务器基础地址")
+    parser.add_argument('--cpu-workers', type=int, default=CPU_WORKERS, help="共享渲染/推理线程数")
+    parser.add_argument('--upload-workers', type=int, default=UPLOAD_WORKERS, help="共享上传线程数")
+    parser.add_argument('--status-every', type=float, default=30.0, help="输出运行状态的间隔 (秒)")
+    parser.add_argument('--duration', type=float, default=None, help="运行指定秒数后退出（测试用）")
+    args = parser.parse_args(argv)
+
+    try:
+        patients = [parse_patient(spec) for spec in args.patient]
+    except ValueError as e:
+        parser.error(str(e))
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    manager = MonitorManager(_timestamped, None, args.server, args.cpu_workers, args.upload_workers)
+    for user_id, config in patients:
+        manager.add(user_id, config)
+    deadline = time.monotonic() + args.duration if args.duration else None
+    last_status = time.monotonic()
+    while not stop.wait(0.5):
+        now = time.monotonic()
+        if now - last_status >= args.status_every:
+            last_status = now
+            _timestamped("运行状态:\n" + manager.status())
+        if deadline and now >= deadline:
+            break
+    for stage in manager.stage_stats():
+        avg = f"{stage['avg_time'] * 1000:.0f}ms" if stage['avg_time'] is not None else "-"
+        _timestamped(f"{stage['name']}: 处理 {stage['processed']} 帧, 丢弃 {stage['dropped']}, 平均 {avg}")
+    manager.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+"""
+离线数据处理：HDF5 波形图生成、上传与开发板文件传输
+
+不依赖 tkinter，GUI 与命令行批处理 (batch_process.py) 共用。
+"""
+
+import base64
+import hashlib
+import random
+import time
+from io import BytesIO
+
+import h5py
+import matplotlib
+matplotlib.use('Agg')  # 设置非交互式后端，避免GUI冲突
+import matplotlib.pyplot as plt
+
+from config import (API_KEY, OFFLINE_PLOT_WIDTH, OFFLINE_PLOT_DPI, OFFLINE_UPLOAD_PATH,
+                    BOARD_HOST, BOARD_PORT, BOARD_TRANSFER_PROTOCOL)
+from envelope import compute_envelope, plot_envelope
+from file_transfer import send_legacy, ResumableSender
+
+
+def sign_headers(api_key=API_KEY):
+    """
+    生成API签名请求头（每次请求或重试重新生成）
+    算法: SHA1(API_KEY + Timestamp + Nonce) 按字母排序后拼接
+    """
+    timestamp = str(int(time.time()))
+    nonce = str(random.randint(100000, 999999))
+    params = [api_key, timestamp, nonce]
+    params.sort()
+    raw_string = ''.join(params)
+    signature = hashlib.sha1(raw_string.encode('utf-8')).hexdigest()
+
+    return {
+        'Content-Type': 'application/json',
+        'Signature': signature,
+        'Timestamp': timestamp,
+        'Nonce': nonce
+    }
+
+
+def create_eeg_plot(path):
+    """
+    创建多通道脑电图
+    :param path: HDF5文件路径
+    :return: 绘制好当前图形的 pyplot 模块
+    """
+    plt.clf()  # 清除当前图形
+    # 分块读取HDF5数据集，每个像素列只保留最小/最大值 (数据形状: (通道数, 样本数))
+    with h5py.File(path, 'r') as f:
+        edges, mins, maxs = compute_envelope(f['data'], OFFLINE_PLOT_WIDTH * OFFLINE_PLOT_DPI)
+    channels = mins.shape[0]
+
+    # 创建多子图布局 (每通道一行)
+    plt.figure(figsize=(OFFLINE_PLOT_WIDTH, 3 * channels))
+    for ch in range(channels):
+        ax = plt.subplot(channels, 1, ch + 1)
+        plot_envelope(ax, edges, mins[ch], maxs[ch], linewidth=0.5)
+        plt.ylabel(f'Ch{ch + 1}', rotation=0, labelpad=20)
+        plt.ylim(-500, 500)  # 固定Y轴范围
+    return plt
+
+
+def plot_to_base64(figure):
+    """转换matplotlib图形为base64字符串"""
+    buffer = BytesIO()
+    figure.savefig(buffer, format='png', dpi=OFFLINE_PLOT_DPI)
+    figure.close()  # 关闭图形释放内存
+    buffer.seek(0)
+    return base64.b64encode(buffer.read()).decode('utf-8')
+
+
+def render_waveform(path, save_path=None):
+    """
+    生成HDF5文件的波形图
+    :param save_path: 本地保存路径 (可选)
+    :return: base64编码的PNG图像
+    """
+    figure = create_eeg_plot(path)
+    if save_path:
+        figure.savefig(save_path, dpi=OFFLINE_PLOT_DPI, bbox_inches='tight')
+    return plot_to_base64(figure)
+
+
+def waveform_payload(user_id, img_base64):
+    """构建离线波形图上传负载"""
+    return {
+        "user_id": user_id,
+        "waveform_data": img_base64,
+        "api_key": API_KEY  # 简单密钥验证
+    }
+
+
+def upload_waveform(client, payload):
+    """
+    上传离线波形图
+    :param client: ApiClient
+    :return: requests.Response
+    :raises requests.RequestException: 重试用尽后仍失败
+    """
+    return client.post(OFFLINE_UPLOAD_PATH, payload, headers=sign_headers, timeout=20)  # 长超时时间
+
+
+def send_to_board(path, user_id, host=BOARD_HOST, port=BOARD_PORT, protocol=BOARD_TRANSFER_PROTOCOL, log=print):
+    """
+    向开发板传输数据文件（文件内容通过 sendfile 流式发送，不整体读入内存）
+    :return: {'bytes': 文件大小, 'seconds': 耗时}
+    :raises OSError: 连接失败或传输中断
+    """
+    if protocol == 'resumable':
+        # 分块校验、断点续传 (需要开发板端支持 EPFT/1)
+        result = ResumableSender(host, port, log=log).send(path, user_id)
+        return {'bytes': result['bytes'], 'seconds': result['seconds']}
+    # 原协议：元数据头 (纯文本) + 文件数据
+    start = time.perf_counter()
+    sent = send_legacy(path, user_id, host, port, timeout=10)  # 10秒超时
+    return {'bytes': sent, 'seconds': time.perf_counter() - start}
@@ -0,0 +1,186 @@
+"""
+OpenBCI-RAW 录制文件增量读取
+
+OpenBCI GUI 持续向 OpenBCI-RAW-*.txt 追加数据。原实现每个周期用 pandas 读取整个文件，
+只为保留最后 1250 行，录制时间越长耗时越大。这里记录已读取的字节偏移，
+每次只解析新追加的完整行并返回，由调用方写入自己的环形缓冲区（RingBuffer），
+使每周期开销与录制时长无关。
+
+文件格式：以 % 开头的注释行 + 一行列名 (Sample Index, EXG Channel 0, ...) + CSV 数据行
+"""
+
+import io
+import os
+
+import numpy as np
+
+TAIL_BYTES_PER_ROW = 512  # 首次打开大文件时按此估算需要回读的字节数
+
+
+class RingBuffer:
+    """预分配的 (样本数 x 通道数) 环形缓冲区"""
+
+    def __init__(self, capacity, channels, dtype=np.float64):
+        self.capacity = capacity
+        self.channels = channels
+        self._data = np.zeros((capacity, channels), dtype=dtype)
+        self._pos = 0  # 下一个写入位置
+        self.total = 0  # 累计写入样本数
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def extend(self, rows):
+        """追加若干行样本 (n, channels)"""
+        n = len(rows)
+        if n == 0:
+            return
+        if n >= self.capacity:
+            self._data[:] = rows[-self.capacity:]
+            self._pos = 0
+        else:
+            end = self._pos + n
+            if end <= self.capacity:
+                self._data[self._pos:end] = rows
+            else:
+                split = self.capacity - self._pos
+                self._data[self._pos:] = rows[:split]
+                self._data[:n - split] = rows[split:]
+            self._pos = end % self.capacity
+        self.total += n
+
+    def latest(self, n):
+        """按时间顺序返回最近 n 个样本的副本（不足时返回全部）"""
+        n = min(n, len(self))
+        start = self._pos - n
+        if start >= 0:
+            return self._data[start:self._pos].copy()
+        return np.concatenate([self._data[start:], self._data[:self._pos]])
+
+    def clear(self):
+        self._pos = 0
+        self.total = 0
+
+
+class OpenBCITailReader:
+    """按字节偏移增量读取 OpenBCI-RAW 文件"""
+
+    def __init__(self, file_path, capacity, max_channels=None):
+        """
+        :param file_path: OpenBCI-RAW 文件路径
+        :param capacity: 调用方保留的样本数（首次打开大文件时只回读这么多行）
+        :param max_channels: 最多读取的 EXG 通道数，None 表示全部
+        """
+        self.file_path = file_path
+        self.capacity = capacity
+        self.max_channels = max_channels
+        self.columns = None  # 列名
+        self.exg_columns = None  # EXG 通道在行中的列索引
+        self._offset = 0
+        self._partial = b''
+
+    @property
+    def channel_count(self):
+        return len(self.exg_columns) if self.exg_columns else 0
+
+    def _parse_header(self, line):
+        """解析列名行，确定 EXG 通道列"""
+        self.columns = [c.strip() for c in line.split(',')]
+        exg = [i for i, c in enumerate(self.columns) if 'EXG Channel' in c]
+        if self.max_channels:
+            exg = exg[:self.max_channels]
+        self.exg_columns = exg
+
+    def _parse_rows(self, lines):
+        """把若干数据行解析为 (n, 通道数) 数组，无法解析的字段记为NaN"""
+        try:
+            # 快速路径：numpy 只转换需要的列
+            return np.loadtxt(io.StringIO('\n'.join(lines)), delimiter=',',
+                              usecols=self.exg_columns, ndmin=2, dtype=np.float64)
+        except ValueError:
+            pass
+        rows = np.full((len(lines), len(self.exg_columns)), np.nan)
+        for r, line in enumerate(lines):
+            parts = line.split(',')
+            for c, idx in enumerate(self.exg_columns):
+                try:
+                    rows[r, c] = float(parts[idx])
+                except (IndexError, ValueError):
+                    pass
+        return rows
+
+    def _reset(self):
+        self._offset = 0
+        self._partial = b''
+        self.columns = None
+        self.exg_columns = None
+
+    def _locate_header(self, f, size):
+        """
+        查找列名行并确定数据起始偏移
+        文件已经很大时直接跳到尾部，只回读足够填满缓冲区的字节
+        :return: 数据起始偏移，列名行尚未完整写入时返回None
+        """
+        f.seek(0)
+        pos = 0
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                return None
+            pos += len(raw)
+            line = raw.decode('utf-8', errors='replace').strip()
+            if line and not line.startswith('%') and 'EXG Channel' in line:
+                self._parse_header(line)
+                break
+        else:
+            return None
+
+        tail_bytes = self.capacity * TAIL_BYTES_PER_ROW
+        if size - pos > tail_bytes:
+            f.seek(size - tail_bytes)
+            f.readline()  # 丢弃第一个不完整的行
+            pos = f.tell()
+        return pos
+
+    def read_new(self):
+        """
+        读取上次之后追加的完整行
+        :return: 新样本数组 (n, 通道数)，没有新数据时 n 为 0
+        """
+        size = os.path.getsize(self.file_path)
+        if size < self._offset:
+            # 文件被截断或替换，从头开始
+            self._reset()
+
+        with open(self.file_path, 'rb') as f:
+            if self.columns is None:
+                start = self._locate_header(f, size)
+                if start is None:
+                    return self._empty()
+                self._offset = start
+                self._partial = b''
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        self._offset += len(chunk)
+
+        data = self._partial + chunk
+        cut = data.rfind(b'\n')
+        if cut < 0:
+            # 没有完整行，保留到下次
+            self._partial = data
+            return self._empty()
+        self._partial = data[cut + 1:]
+
+        lines = []
+        for line in data[:cut].decode('utf-8', errors='replace').splitlines():
+            line = line.strip()
+            # 跳过空行、注释行和重复的列名行
+            if not line or line.startswith('%') or 'EXG Channel' in line:
+                continue
+            lines.append(line)
+        if not lines:
+            return self._empty()
+
+        return self._parse_rows(lines)
+
+    def _empty(self):
+        return np.empty((0, self.channel_count))
@@ -0,0 +1,315 @@
+"""
+实时监测流水线组件
+
+采集、渲染、上传各自运行在独立的工作线程中，阶段之间通过有界队列连接。
+队列满时丢弃最旧的数据（latest-wins）：实时波形只关心最新一帧，
+上传慢时丢弃积压的旧帧，而不是拖慢采集与渲染。
+
+同时监测多名患者时，各流水线的同一阶段可以注册到共享的线程池 (SharedStagePool)，
+线程池按轮转顺序服务各流水线的输入队列，每条流水线同一时刻最多占用一个线程，
+单个患者处理慢不会占满线程池。
+"""
+
+import threading
+import time
+from collections import deque
+
+EWMA_ALPHA = 0.2  # 耗时滑动平均的平滑系数
+
+
+def ewma(previous, value, alpha=EWMA_ALPHA):
+    """指数滑动平均，previous为None时直接取value"""
+    return value if previous is None else previous + alpha * (value - previous)
+
+
+class LatestQueue:
+    """有界队列，满时丢弃最旧元素"""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._listeners = []  # 放入元素后调用的回调（共享线程池据此唤醒工作线程）
+        self.dropped = 0  # 因队列满而丢弃的元素数
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+        for listener in self._listeners:
+            listener()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def get(self, timeout=None):
+        """取出最早的元素，超时或队列关闭时返回None"""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+    def close(self):
+        """关闭队列并唤醒等待的消费者"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        with self._cond:
+            self._items.clear()
+            self._closed = False
+
+
+class StageWorker(threading.Thread):
+    """从输入队列取数据、处理后放入输出队列的流水线阶段"""
+
+    def __init__(self, name, func, inbox, outbox=None, log=None):
+        """
+        :param name: 阶段名称
+        :param func: 处理函数，返回None表示不向下游传递
+        :param inbox: 输入队列
+        :param outbox: 输出队列
+        :param log: 日志函数
+        """
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.log = log
+        self.running = True
+        self.processed = 0  # 已处理元素数
+        self.busy_time = 0.0  # 累计处理耗时 (秒)
+        self.avg_time = None  # 单项处理耗时的滑动平均 (秒)
+
+    def run(self):
+        while self.running:
+            item = self.inbox.get(timeout=0.5)
+            if item is None:
+                continue
+            start = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                if self.log:
+                    self.log(f"{self.name}阶段异常: {str(e)}")
+                continue
+            finally:
+                elapsed = time.perf_counter() - start
+                self.busy_time += elapsed
+                self.avg_time = ewma(self.avg_time, elapsed)
+            self.processed += 1
+            if self.outbox is not None and result is not None:
+                self.outbox.put(result)
+
+    def stop(self):
+        self.running = False
+        self.inbox.close()
+
+
+class PooledStage:
+    """注册到共享线程池的流水线阶段，接口与 StageWorker 相同（start/stop/join/avg_time）"""
+
+    def __init__(self, pool, name, func, inbox, outbox=None, log=None):
+        self.pool = pool
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.log = log
+        self.busy = False  # 是否正被某个工作线程处理
+        self.processed = 0  # 已处理元素数
+        self.busy_time = 0.0  # 累计处理耗时 (秒)
+        self.avg_time = None  # 单项处理耗时的滑动平均 (秒)
+
+    def start(self):
+        """工作线程由线程池管理，这里无需启动"""
+
+    def stop(self):
+        self.pool.unregister(self)
+        self.inbox.close()
+
+    def join(self, timeout=None):
+        """等待正在处理的元素完成"""
+        self.pool.wait_idle(self, timeout)
+
+
+class SharedStagePool:
+    """多条流水线共用的阶段线程池，按轮转顺序公平地服务各流水线"""
+
+    def __init__(self, name, workers=2, log=None):
+        """
+        :param name: 阶段名称（线程名）
+        :param workers: 工作线程数
+        :param log: 日志函数
+        """
+        self.name = name
+        self.workers = workers
+        self.log = log
+        self._stages = []
+        self._cursor = 0  # 下一次从该位置开始查找，保证轮转
+        self._cond = threading.Condition()
+        self._threads = []
+        self.running = False
+
+    def register(self, name, func, inbox, outbox=None, log=None):
+        """
+        注册一条流水线的阶段
+        :return: PooledStage
+        """
+        stage = PooledStage(self, name, func, inbox, outbox, log or self.log)
+        inbox.add_listener(self._wake)
+        with self._cond:
+            self._stages.append(stage)
+            self._cond.notify()
+        return stage
+
+    def unregister(self, stage):
+        stage.inbox.remove_listener(self._wake)
+        with self._cond:
+            if stage in self._stages:
+                self._stages.remove(stage)
+
+    def wait_idle(self, stage, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: not stage.busy, timeout)
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _next_ready(self):
+        """从轮转位置开始，找到第一个有数据且未被处理的阶段"""
+        count = len(self._stages)
+        for offset in range(count):
+            index = (self._cursor + offset) % count
+            stage = self._stages[index]
+            if not stage.busy and stage.inbox.qsize():
+                self._cursor = index + 1
+                return stage
+        return None
+
+    def _run(self):
+        while self.running:
+            with self._cond:
+                stage = self._next_ready()
+                if stage is None:
+                    self._cond.wait(0.5)
+                    continue
+                stage.busy = True
+            try:
+                self._process(stage)
+            finally:
+                with self._cond:
+                    stage.busy = False
+                    self._cond.notify_all()
+
+    def _process(self, stage):
+        item = stage.inbox.get(timeout=0)
+        if item is None:
+            return
+        start = time.perf_counter()
+        try:
+            result = stage.func(item)
+        except Exception as e:
+            if stage.log:
+                stage.log(f"{stage.name}阶段异常: {str(e)}")
+            return
+        finally:
+            elapsed = time.perf_counter() - start
+            stage.busy_time += elapsed
+            stage.avg_time = ewma(stage.avg_time, elapsed)
+        stage.processed += 1
+        if stage.outbox is not None and result is not None:
+            stage.outbox.put(result)
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self._threads = [threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self):
+        """各注册阶段的处理数与平均耗时"""
+        with self._cond:
+            return [{'name': stage.name, 'processed': stage.processed, 'pending': stage.inbox.qsize(),
+                     'dropped': stage.inbox.dropped, 'avg_time': stage.avg_time}
+                    for stage in self._stages]
+
+
+class HopScheduler:
+    """
+    固定步长的截止时间调度器
+
+    按绝对截止时间推进（next = 上一截止时间 + 步长），单次处理耗时不会累积成漂移；
+    错过的截止时间直接跳过而不是连续补跑。流水线吞吐量受最慢阶段限制，
+    当最慢阶段的平均耗时超过步长的 headroom 倍时步长加倍（降级），
+    耗时回落到一半以下时步长减半，直至恢复配置值。
+    """
+
+    def __init__(self, hop, min_hop=0.25, max_hop=None, headroom=0.8):
+        """
+        :param hop: 配置的步长 (秒)
+        :param min_hop: 步长下限 (秒)
+        :param max_hop: 降级时的步长上限 (秒)，默认为配置的步长
+        :param headroom: 允许处理耗时占步长的比例
+        """
+        self.target_hop = max(hop, min_hop)
+        self.hop = self.target_hop
+        self.max_hop = max(max_hop or self.target_hop, self.target_hop)
+        self.headroom = headroom
+        self.next_deadline = None
+        self.skipped = 0  # 因超时而跳过的截止时间数
+
+    def next_delay(self):
+        """推进到下一个截止时间，返回需要等待的秒数"""
+        now = time.monotonic()
+        if self.next_deadline is None:
+            self.next_deadline = now
+        self.next_deadline += self.hop
+        if self.next_deadline < now:
+            missed = int((now - self.next_deadline) // self.hop) + 1
+            self.skipped += missed
+            self.next_deadline += missed * self.hop
+        return self.next_deadline - now
+
+    def adapt(self, cost):
+        """
+        根据最慢阶段的平均耗时调整步长
+        :param cost: 单帧耗时 (秒)
+        :return: 步长是否变化
+        """
+        if cost is None:
+            return False
+        budget = self.hop * self.headroom
+        if cost > budget and self.hop < self.max_hop:
+            self.hop = min(self.max_hop, self.hop * 2)
+        elif cost < budget / 2 and self.hop > self.target_hop:
+            self.hop = max(self.target_hop, self.hop / 2)
+        else:
+            return False
+        return True
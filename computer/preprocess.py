@@ -0,0 +1,132 @@
+"""
+脑电数据向量化预处理
+
+对完整的 (样本数 x 通道数) 数组一次性完成：
+- NaN 修复：向前填充；开头的 NaN 用上一数据块的最后有效值填充，没有时向后填充，整列无效时置0
+- 平坦通道检测：窗口内峰峰值过小（电极脱落、通道未接）
+- 削波检测：样本贴近 ADC 量程上限的比例过高（饱和）
+通道数由数据本身决定，适用于 8 通道 Cyton 和 16 通道 Daisy。
+"""
+
+import warnings
+
+import numpy as np
+
+FLATLINE_THRESHOLD = 1e-3  # 峰峰值低于此值视为平坦 (μV)
+CLIP_LIMIT = 187500.0  # Cyton ADC 量程 (±μV)
+CLIP_FRACTION = 0.01  # 超过该比例的样本饱和即视为削波
+
+
+def fill_nans(data, last_valid=None):
+    """
+    向量化 NaN 修复
+    :param data: (样本数, 通道数) 数组，原地修改
+    :param last_valid: 上一数据块每个通道的最后有效值，可为None或含NaN
+    :return: (修复后的数组, 每通道NaN个数)
+    """
+    mask = np.isnan(data)
+    nan_counts = mask.sum(axis=0)
+    if not nan_counts.any():
+        return data, nan_counts
+
+    n, channels = data.shape
+    cols = np.arange(channels)
+    # 每个位置最近一次有效样本的行号，之前没有有效样本时为 -1
+    idx = np.where(mask, -1, np.arange(n)[:, np.newaxis])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    leading = idx < 0
+    filled = data[np.maximum(idx, 0), cols]
+
+    if leading.any():
+        # 开头的 NaN：优先使用上一块的最后有效值，其次使用本块第一个有效值，整列无效则为0
+        valid_any = ~mask.all(axis=0)
+        first_valid = np.where(valid_any, data[mask.argmin(axis=0), cols], 0.0)
+        if last_valid is not None:
+            first_valid = np.where(np.isnan(last_valid), first_valid, last_valid)
+        filled[leading] = np.broadcast_to(first_valid, data.shape)[leading]
+
+    data[:] = filled
+    return data, nan_counts
+
+
+def detect_flatline(window, threshold=FLATLINE_THRESHOLD):
+    """返回每个通道是否平坦（忽略NaN，整列NaN视为平坦）"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        ptp = np.nanmax(window, axis=0) - np.nanmin(window, axis=0)
+    return ~(ptp >= threshold)
+
+
+def detect_clipping(window, limit=CLIP_LIMIT, fraction=CLIP_FRACTION):
+    """返回每个通道是否削波"""
+    with np.errstate(invalid='ignore'):
+        saturated = np.abs(window) >= limit * 0.999
+    return saturated.mean(axis=0) > fraction
+
+
+class Preprocessor:
+    """跨数据块保留每通道最后有效值的预处理器"""
+
+    def __init__(self):
+        self.last_valid = None
+
+    def process(self, chunk):
+        """
+        修复新数据块中的NaN
+        :return: (修复后的数组, 每通道NaN个数)
+        """
+        chunk, nan_counts = fill_nans(chunk, self.last_valid)
+        if len(chunk):
+            self.last_valid = chunk[-1].copy()
+        return chunk, nan_counts
+
+    @staticmethod
+    def assess(window):
+        """
+        评估原始数据窗口的信号质量
+        :return: {'flat': 平坦通道列表, 'clipped': 削波通道列表}
+        """
+        return {
+            'flat': np.flatnonzero(detect_flatline(window)).tolist(),
+            'clipped': np.flatnonzero(detect_clipping(window)).tolist()
+        }
+
+
+# ===================== 微基准测试 =====================
+def _legacy_repair(exg_data):
+    """原实现：逐通道循环，从末尾向前逐元素查找最后有效值"""
+    for channel_idx in range(exg_data.shape[1]):
+        channel_data = exg_data[:, channel_idx]
+        nan_mask = np.isnan(channel_data)
+        nan_count = np.sum(nan_mask)
+        if nan_count > 0:
+            if nan_count == len(channel_data):
+                exg_data[:, channel_idx] = 0
+            else:
+                last_valid_value = None
+                for i in range(len(channel_data) - 1, -1, -1):
+                    if not np.isnan(channel_data[i]):
+                        last_valid_value = channel_data[i]
+                        break
+                channel_data[nan_mask] = last_valid_value
+                exg_data[:, channel_idx] = channel_data
+    return exg_data
+
+
+def _benchmark(repeat=200):
+    import timeit
+
+    rng = np.random.default_rng(0)
+    for channels in (8, 16):
+        base = rng.normal(size=(1250, channels)) * 50
+        # 5% 随机NaN，且每个通道末尾有一段连续NaN（原实现需要逐元素回溯）
+        base[rng.random(base.shape) < 0.05] = np.nan
+        base[-200:, :] = np.nan
+        legacy = timeit.timeit(lambda: _legacy_repair(base.copy()), number=repeat) / repeat
+        vectorized = timeit.timeit(lambda: fill_nans(base.copy()), number=repeat) / repeat
+        print(f"{channels}通道 x 1250样本: 原循环 {legacy * 1e3:.3f}ms, "
+              f"向量化 {vectorized * 1e3:.3f}ms, 加速 {legacy / vectorized:.1f}x")
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,615 @@
+"""
+实时脑电监测引擎
+
+从数据源（OpenBCI 录制文件、UDP/LSL 网络流或合成信号）读取样本，预处理、滤波后
+渲染波形图并上传服务器。采集、渲染、上传分别运行在独立线程中。
+存在 model.onnx 时另有推理线程在本地检测发作状态，状态和各类别概率以 desktop_detection
+参数上报 /lotdata（服务器单独保存，不覆盖开发板的 epilepsy_state、不触发告警）。
+
+不依赖 tkinter，可由 GUI (epilepsy_app_new.py) 使用，也可作为独立服务运行：
+    python realtime_monitor.py --user-id 1001
+    python realtime_monitor.py --user-id 1001 --source synthetic --interval 1
+重量级模块按需导入：scipy 在首次滤波时导入，matplotlib/PIL 在首次渲染时导入，
+onnxruntime 在启用推理时导入。
+"""
+
+import argparse
+import base64
+import hashlib
+import os
+import random
+import signal
+import threading
+import time
+
+import numpy as np
+
+from openbci_reader import RingBuffer  # 预分配环形缓冲区
+from acquisition import create_source  # 实时采集数据源
+from recording_watcher import find_latest_recording  # 录制目录监视
+from stream_filter import StreamingFilterBank  # 流式滤波器组（scipy 在首次使用时导入）
+from preprocess import Preprocessor  # 向量化预处理
+from config import SERVER_URL, API_KEY
+from pipeline import LatestQueue, StageWorker, HopScheduler, ewma  # 流水线队列、工作线程与步长调度
+from http_client import ApiClient  # 长连接HTTP会话（重试与退避）
+from upload_spool import UploadSpool, SpoolReplayer  # 上传失败帧的磁盘暂存与补传
+from stage_timing import StageTimings, measure, record  # 分阶段耗时统计
+
+# ===================== 实时监测参数配置 =====================
+# 数据源: 'file' 读取 OpenBCI GUI 录制文件, 'udp' / 'lsl' 接收 OpenBCI GUI Networking 输出,
+# 'synthetic' 本地生成合成信号（无硬件测试）
+REALTIME_SOURCE = 'file'
+REALTIME_RECORDINGS_DIR = r"C:\Users\Windows\Documents\OpenBCI_GUI\Recordings"  # OpenBCI数据存储路径
+REALTIME_UDP_ADDRESS = ('127.0.0.1', 12345)  # OpenBCI GUI UDP 输出地址
+REALTIME_LSL_STREAM_TYPE = 'EEG'  # OpenBCI GUI LSL 输出的数据流类型
+REALTIME_SAMPLE_RATE = 250  # 采样率 (Hz)
+REALTIME_PLOT_DURATION = 5  # 单次波形图时间跨度 (秒)
+# 绘图/上传间隔，即滑动窗口步长 (秒)。小于 REALTIME_PLOT_DURATION 时为高刷新模式：
+# 窗口仍为5秒，每步只读取和滤波新到达的样本，其余样本复用环形缓冲区中已滤波的数据
+REALTIME_PLOT_INTERVAL = 5.0
+REALTIME_MIN_INTERVAL = 0.25  # 步长下限 (秒)
+REALTIME_SAMPLE_COUNT = int(REALTIME_SAMPLE_RATE * REALTIME_PLOT_DURATION)  # 单次处理样本数
+REALTIME_IMAGE_WIDTH = 1500  # 波形图宽度 (像素)，高度随通道数按比例变化；降低可减少渲染与上传耗时
+REALTIME_FRAME_BUDGET = 100 * 1024  # 每帧图像字节预算，超出时降低调色板颜色数与像素尺寸
+# 允许的图像格式；小程序按 data:image/png 显示，确认客户端支持 WebP 后再加入 'webp'
+REALTIME_IMAGE_FORMATS = ('png',)
+REALTIME_CUTOFF_FREQ = 50.0  # 低通滤波截止频率 (Hz)
+# 滤波链: (类型, 频率[, 阶数/品质因数])，可追加 ('highpass', 0.5) 去基线漂移、('notch', 50.0) 去工频干扰
+REALTIME_FILTER_CHAIN = [('lowpass', REALTIME_CUTOFF_FREQ)]
+REALTIME_CLEANUP_PATH = "/api/clean-waveform"  # 服务器数据清理接口
+REALTIME_QUEUE_SIZE = 2  # 流水线各阶段队列容量，满时丢弃最旧的帧
+# 本地发作检测：train/pth2onnx.py 导出的模型（同目录的 mean.npy / std.npy 用于标准化），文件不存在时不做推理
+REALTIME_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model.onnx')
+REALTIME_SEIZURE_THRESHOLD = 0.5  # 发作期概率达到该值时判定为发作
+REALTIME_STATE_PATH = "/lotdata"  # 检测结果上报接口（desktop_detection: 用户ID*时间戳*状态*各类别概率）
+REALTIME_STATE_HEARTBEAT = 30.0  # 状态不变时的重复上报间隔 (秒)
+REALTIME_UPLOAD_IMAGES = True  # False 时只上报检测结果，不渲染和上传波形图
+REALTIME_TIMING_LOG = None  # 分阶段耗时的 JSON Lines 输出路径，为None时只在界面/状态中显示统计
+
+# ===================== 实时监测核心类 =====================
+class RealTimeMonitor:
+    """实时脑电监测引擎，包含数据采集、处理、上传全流程"""
+    
+    def __init__(self, user_id, log_callback, status_callback, client=None, spool=None, replayer=None,
+                 source_config=None, cpu_pool=None, upload_pool=None):
+        """
+        初始化实时监测器
+        :param user_id: 用户唯一标识
+        :param log_callback: 日志回调函数
+        :param status_callback: 状态更新回调函数
+        :param client: 共享的 ApiClient，为None时新建
+        :param spool: 共享的上传暂存队列（离线上传失败的数据），为None时使用默认路径
+        :param replayer: 共享的补传线程，为None时由监测器自行启动和停止
+        :param source_config: 本监测器的数据源配置 {'kind': ..., 其他构造参数}，为None时使用 REALTIME_* 配置
+        :param cpu_pool: 共享的渲染/推理线程池 (SharedStagePool)，为None时使用独立线程
+        :param upload_pool: 共享的上传线程池 (SharedStagePool)，为None时使用独立线程
+        """
+        self.user_id = user_id
+        self.source_config = dict(source_config or {})
+        self.cpu_pool = cpu_pool
+        self.upload_pool = upload_pool
+        self.log_callback = log_callback  # 日志输出回调
+        self.status_callback = status_callback  # 状态更新回调
+        self.running = False  # 运行状态标志
+        self.monitor_thread = None  # 监控线程句柄
+        self.source = None  # 采集数据源
+        self.raw = None  # 原始样本的环形缓冲区（信号质量检测）
+        self.last_sample_time = None  # 最新样本的采集时间戳
+        self.filter_bank = None  # 流式滤波器组（跨周期保留状态）
+        self.filtered = None  # 滤波后样本的环形缓冲区
+        self.preprocessor = None  # NaN修复与信号质量检测
+        self.last_quality = None  # 上一次的信号质量检测结果
+        self.renderer = None  # 常驻画布的波形渲染器
+        self.encoder = None  # 按字节预算量化与编码波形图
+        self.timings = None  # 分阶段耗时统计（每次启动时新建）
+        self.detector = None  # 本地发作检测（会话与缓冲区跨窗口复用）
+        self.inference_samples = 0  # 检测窗口的样本数（采集采样率下）
+        self.last_inference = None  # 最近一次检测结果
+        self.reported_state = None  # 最近一次上报的发作状态
+        self.last_report = 0.0  # 最近一次上报的时间 (monotonic)
+        self.report_seq = 0  # 上报序号（服务器据此去重）
+        # 流水线：采集 -> 渲染队列 -> 渲染线程 -> 上传队列 -> 上传线程
+        #              └-> 推理队列 -> 推理线程（上报发作状态）
+        self.render_queue = LatestQueue(maxsize=REALTIME_QUEUE_SIZE)
+        self.upload_queue = LatestQueue(maxsize=REALTIME_QUEUE_SIZE)
+        self.inference_queue = LatestQueue(maxsize=REALTIME_QUEUE_SIZE)
+        self.stages = []  # 流水线工作线程
+        self.compute_stages = []  # 参与步长调度的阶段（渲染、推理）
+        self._stop_event = threading.Event()
+        self.scheduler = None  # 步长调度器（处理耗时超出预算时自动增大步长）
+        self.acquire_time = None  # 采集阶段耗时的滑动平均 (秒)
+        self.client = client or ApiClient(SERVER_URL, log=self.log)  # 复用连接的HTTP客户端
+        self.spool = spool or UploadSpool()  # 离线上传失败数据的磁盘暂存（实时帧不暂存）
+        self._own_replayer = replayer is None
+        self.replayer = replayer
+        
+    def log(self, message):
+        """日志记录方法（通过回调传递到GUI）"""
+        if self.log_callback:
+            self.log_callback(message)
+            
+    def update_status(self, status):
+        """状态更新方法（通过回调传递到GUI）"""
+        if self.status_callback:
+            self.status_callback(status)
+    
+    def get_latest_file(self):
+        """获取OpenBCI最新数据文件路径"""
+        return find_latest_recording(self.source_config.get('recordings_dir', REALTIME_RECORDINGS_DIR))
+
+    def create_source(self):
+        """按 source_config（未指定的项使用 REALTIME_* 配置）创建采集数据源"""
+        overrides = dict(self.source_config)
+        kind = overrides.pop('kind', REALTIME_SOURCE)
+        if kind == 'file':
+            options = {'recordings_dir': REALTIME_RECORDINGS_DIR, 'capacity': REALTIME_SAMPLE_COUNT,
+                       'file_path': self.get_latest_file(), 'log': self.log}
+        elif kind == 'udp':
+            options = {'host': REALTIME_UDP_ADDRESS[0], 'port': REALTIME_UDP_ADDRESS[1]}
+        elif kind == 'lsl':
+            options = {'stream_type': REALTIME_LSL_STREAM_TYPE}
+        else:
+            options = {}
+        options.update(overrides)
+        return create_source(kind, REALTIME_SAMPLE_RATE, **options)
+
+    def read_latest_data(self, sample_count):
+        """
+        从数据源读取新样本并预处理
+        :param sample_count: 需要返回的样本数量
+        :return: 滤波后的脑电数据 (样本数 x 通道数的numpy数组)
+        """
+        try:
+            # 数据源只返回上次之后新到达的样本块
+            # 通道数由数据源决定 (Cyton 8通道 / Daisy 16通道)
+            block = self.source.read()
+            new_rows = block.data
+            
+            # 只对新样本做NaN处理和滤波，滤波器状态跨周期保留
+            if len(new_rows) > 0:
+                if self.raw is None or self.raw.channels != new_rows.shape[1]:
+                    # 首个数据块或通道数变化：重建预处理器、滤波器和缓冲区
+                    # 原始样本缓冲区同时提供检测窗口（可能长于波形图窗口）
+                    self.preprocessor = Preprocessor()
+                    self.raw = RingBuffer(max(sample_count, self.inference_samples), new_rows.shape[1])
+                    self.filter_bank = StreamingFilterBank(
+                        REALTIME_FILTER_CHAIN, REALTIME_SAMPLE_RATE, new_rows.shape[1])
+                    self.filtered = RingBuffer(sample_count, new_rows.shape[1])
+                with measure(self.timings, 'NaN修复'):
+                    new_rows, nan_counts = self.preprocessor.process(new_rows)
+                if nan_counts.any():
+                    detail = ", ".join(f"Ch{ch}:{nan_counts[ch]}" for ch in np.flatnonzero(nan_counts))
+                    self.log(f"警告：发现NaN值并已填充 ({detail})")
+                self.raw.extend(new_rows)
+                self.check_signal_quality(self.raw.latest(sample_count))
+                with measure(self.timings, '滤波'):
+                    self.filtered.extend(self.filter_bank.process(new_rows))
+                self.last_sample_time = float(block.timestamps[-1])
+            
+            if self.filtered is None or len(self.filtered) == 0:
+                self.log("数据源中暂无有效样本")
+                return None
+            
+            # 取最近的滤波后样本
+            filtered_data = self.filtered.latest(sample_count)
+            
+            # 处理数据不足的情况 (用首行数据向前填充)
+            if len(filtered_data) < sample_count:
+                padding = np.tile(filtered_data[0], (sample_count - len(filtered_data), 1))
+                filtered_data = np.vstack([padding, filtered_data])
+            
+            return filtered_data
+        
+        except Exception as e:
+            self.log(f"数据读取错误: {str(e)}")
+            return None
+
+    def check_signal_quality(self, raw_window):
+        """检测平坦/削波通道，仅在状态变化时记录日志"""
+        quality = self.preprocessor.assess(raw_window)
+        if quality != self.last_quality:
+            if quality['flat']:
+                self.log(f"警告：通道 {quality['flat']} 信号平坦，请检查电极连接")
+            if quality['clipped']:
+                self.log(f"警告：通道 {quality['clipped']} 信号削波 (超出量程)")
+            self.last_quality = quality
+
+    def plot_waveforms(self, data):
+        """
+        绘制多通道脑电波形图并按字节预算编码
+        :param data: 形状为(N, 通道数)的脑电数据
+        :return: (base64编码的图像, EncodedFrame 编码信息)
+        """
+        # matplotlib/PIL 在首次渲染时导入
+        from waveform_renderer import WaveformRenderer, FIGURE_WIDTH
+        from frame_encoder import FrameEncoder
+        if self.encoder is None:
+            self.encoder = FrameEncoder(REALTIME_FRAME_BUDGET, REALTIME_IMAGE_FORMATS)
+        # 画布只在首次、数据尺寸或编码档位的像素尺寸变化时创建，之后每帧只更新曲线数据
+        dpi = REALTIME_IMAGE_WIDTH * self.encoder.scale / FIGURE_WIDTH
+        if (self.renderer is None or not self.renderer.matches(len(data), data.shape[1])
+                or self.renderer.dpi != dpi):
+            self.renderer = WaveformRenderer(data.shape[1], len(data), REALTIME_SAMPLE_RATE, dpi=dpi)
+        with measure(self.timings, '渲染'):
+            self.renderer.draw(data)
+            image = self.renderer.to_image()
+        encoded = self.encoder.encode(image)
+        record(self.timings, '图像编码', encoded.seconds)
+        # 返回base64编码字符串
+        with measure(self.timings, 'base64'):
+            img_base64 = base64.b64encode(encoded.data).decode('utf-8')
+        return img_base64, encoded
+
+    @staticmethod
+    def generate_signature():
+        """
+        生成API请求签名 (防重放攻击)
+        算法: SHA1(API_KEY + Timestamp + Nonce) 按字母排序后拼接
+        :return: 包含签名参数的字典
+        """
+        timestamp = str(int(time.time()))  # 当前时间戳
+        nonce = str(random.randint(100000, 999999))  # 随机数
+        params = [API_KEY, timestamp, nonce]
+        params.sort()  # 参数排序
+        raw_string = ''.join(params)  # 拼接字符串
+        signature = hashlib.sha1(raw_string.encode('utf-8')).hexdigest()  # SHA1哈希
+        
+        return {
+            'Signature': signature,
+            'Timestamp': timestamp,
+            'Nonce': nonce
+        }
+
+    def upload_waveform(self, img_base64, encoded=None):
+        """
+        上传波形图到服务器；失败的帧直接丢弃（服务器只显示最新帧，补传旧帧没有意义），
+        成功时通知补传线程发送离线上传暂存的数据
+        :param img_base64: base64编码的图像数据
+        :param encoded: 图像编码信息 (EncodedFrame)，用于日志
+        :return: 上传成功返回True, 否则False
+        """
+        # 构建JSON负载
+        payload = {
+            "user_id": self.user_id,
+            "waveform_data": img_base64
+        }
+        
+        start = time.perf_counter()
+        try:
+            # 发送POST请求到实时上传接口（每次尝试重新生成签名，重试不超过一个上传间隔）
+            response = self.client.post(
+                "/api/realtime-upload-waveform",
+                payload,
+                headers=self.generate_signature,
+                timeout=5,  # 5秒超时
+                deadline=time.monotonic() + (self.scheduler.hop if self.scheduler else REALTIME_PLOT_INTERVAL)
+            )
+            
+            if response.status_code == 200:
+                detail = ""
+                if encoded is not None:
+                    detail = (f", 图像: {len(encoded.data) / 1024:.0f}KB {encoded.format}"
+                              f" {encoded.colors}色 x{encoded.scale:g}, 编码 {encoded.seconds * 1000:.0f}ms")
+                self.log(f"波形图上传成功! 时间: {time.strftime('%H:%M:%S')}, "
+                         f"耗时: {(time.perf_counter() - start) * 1000:.0f}ms{detail}")
+                self.replayer.notify_online()  # 网络已恢复，开始补传离线上传的暂存数据
+                return True
+            else:
+                self.log(f"上传失败: {response.status_code} - {response.text}")
+                return False
+        except Exception as e:
+            self.log(f"上传异常: {str(e)}")
+            return False
+
+    def load_detector(self):
+        """加载本地发作检测模型，模型不存在或加载失败时只上传波形图"""
+        if not os.path.exists(REALTIME_MODEL_PATH):
+            self.log(f"未找到检测模型 {REALTIME_MODEL_PATH}，不进行本地检测")
+            return None
+        try:
+            from seizure_inference import SeizureDetector  # onnxruntime 在此时导入
+            detector = SeizureDetector(REALTIME_MODEL_PATH, threshold=REALTIME_SEIZURE_THRESHOLD)
+        except Exception as e:
+            self.log(f"检测模型加载失败: {str(e)}")
+            return None
+        self.log(f"已加载检测模型: {REALTIME_MODEL_PATH}")
+        return detector
+
+    def report_state(self, result, captured_at):
+        """
+        上报本地检测结果（desktop_detection 参数：用户ID*时间戳*状态*各类别概率）
+        模型输入是补零、重采样后的 8/16 通道数据，只作参考：服务器单独保存，
+        不覆盖开发板上报的 epilepsy_state，也不向看护人发布告警
+        :param result: SeizureDetector.predict 的返回值
+        :param captured_at: 检测窗口最后一个样本的采集时间戳 (秒)
+        """
+        self.report_seq += 1
+        timestamp = int(captured_at)
+        probabilities = ",".join(f"{p:.3f}" for p in result['probabilities'])
+        payload = {
+            "devicename": f"desktop-{self.user_id}",
+            "timestamp": timestamp,
+            "seq": self.report_seq,
+            "payload": {"params": {
+                "desktop_detection": f"{self.user_id}*{timestamp}*{result['state']}*{probabilities}"}}
+        }
+        try:
+            response = self.client.post(
+                REALTIME_STATE_PATH,
+                payload,
+                headers=self.generate_signature,
+                timeout=5,
+                deadline=time.monotonic() + (self.scheduler.hop if self.scheduler else REALTIME_PLOT_INTERVAL)
+            )
+        except Exception as e:
+            self.log(f"状态上报异常: {str(e)}")
+            return False
+        if response.status_code != 200:
+            self.log(f"状态上报失败: {response.status_code} - {response.text}")
+            return False
+        return True
+
+    def initialize_cleanup(self):
+        """初始化时清理服务器上的旧数据"""
+        payload = {"user_id": self.user_id}
+        
+        self.log(f"初始化清理用户 {self.user_id} 的服务器数据...")
+        
+        try:
+            # 发送清理请求
+            response = self.client.post(
+                REALTIME_CLEANUP_PATH,
+                payload,
+                headers=self.generate_signature,
+                timeout=5
+            )
+            
+            if response.status_code == 200:
+                res_data = response.json()
+                if res_data.get('success'):
+                    deleted_count = res_data.get('deleted_count', 0)
+                    self.log(f"✅ 清理成功! 已删除 {deleted_count} 条记录")
+                    return True
+                else:
+                    self.log(f"清理失败: {res_data.get('message', '未知错误')}")
+            else:
+                self.log(f"清理请求失败: {response.status_code} - {response.text}")
+        except Exception as e:
+            self.log(f"清理请求异常: {str(e)}")
+        
+        return False
+
+    def start(self):
+        """启动实时监测服务"""
+        if self.running:
+            self.log("实时监测已运行")
+            return
+            
+        # 服务器数据清理
+        if not self.initialize_cleanup():
+            self.log("警告：服务器清理失败")
+            
+        self.running = True
+        self._stop_event.clear()
+        self.timings = StageTimings(dump_path=REALTIME_TIMING_LOG, extra={'user_id': self.user_id})
+        self.scheduler = HopScheduler(REALTIME_PLOT_INTERVAL, REALTIME_MIN_INTERVAL,
+                                      max_hop=REALTIME_PLOT_DURATION)
+        self.acquire_time = None
+        self.render_queue.reopen()
+        self.upload_queue.reopen()
+        self.inference_queue.reopen()
+        self.detector = self.load_detector()
+        self.inference_samples = self.detector.input_samples(REALTIME_SAMPLE_RATE) if self.detector else 0
+        self.raw = None  # 按检测窗口长度重建缓冲区
+        self.reported_state = None
+        # 渲染、上传与推理各自运行在独立线程中（或共享线程池），上传慢不会拖慢采集与渲染
+        # 上传阶段不参与步长调度：网络慢时由最新帧队列丢帧、由编码器收紧每帧预算
+        self.stages = []
+        self.compute_stages = []
+        if REALTIME_UPLOAD_IMAGES or not self.detector:
+            self.compute_stages.append(
+                self._create_stage("渲染", self._render_stage, self.render_queue, self.upload_queue, self.cpu_pool))
+            self.stages.append(
+                self._create_stage("上传", self._upload_stage, self.upload_queue, None, self.upload_pool))
+        if self.detector:
+            self.compute_stages.append(
+                self._create_stage("推理", self._inference_stage, self.inference_queue, None, self.cpu_pool))
+        self.stages += self.compute_stages
+        for stage in self.stages:
+            stage.start()
+        if self._own_replayer:
+            self.replayer = SpoolReplayer(self.spool, self.client, self.generate_signature, log=self.log)
+            self.replayer.start()
+        # 创建守护线程运行采集循环
+        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
+        self.monitor_thread.start()
+        self.update_status("实时监测运行中")
+        self.log("实时脑电监测已启动")
+        
+    def _create_stage(self, name, func, inbox, outbox, pool):
+        """创建流水线阶段：有共享线程池时注册到线程池，否则使用独立线程"""
+        if pool is not None:
+            return pool.register(f"{self.user_id}/{name}", func, inbox, outbox, self.log)
+        return StageWorker(name, func, inbox, outbox, self.log)
+
+    def stop(self):
+        """停止实时监测服务"""
+        self.running = False
+        self._stop_event.set()
+        for stage in self.stages:
+            stage.stop()
+        if self.monitor_thread and self.monitor_thread.is_alive():
+            self.monitor_thread.join(2.0)  # 等待线程结束
+        for stage in self.stages:
+            stage.join(2.0)
+        self.stages = []
+        self.compute_stages = []
+        if self._own_replayer and self.replayer:
+            self.replayer.stop()
+        if self.timings:
+            self.timings.close()  # 保留统计供界面查看，只关闭 JSON Lines 文件
+        self.update_status("实时监测已停止")
+        self.log("实时脑电监测已停止")
+    
+    def pipeline_status(self):
+        """
+        流水线各阶段的积压与丢帧情况
+        采集线程不再每个周期回调 status_callback（GUI 的回调不能在非主线程调用），由调用方定时读取
+        """
+        if not self.running or self.scheduler is None:
+            return "实时监测已停止"
+        status = (f"实时监测运行中 | 刷新间隔 {self.scheduler.hop:.2f}s"
+                  f" | 渲染队列 {self.render_queue.qsize()}/{self.render_queue.maxsize}"
+                  f" 丢弃 {self.render_queue.dropped}"
+                  f" | 上传队列 {self.upload_queue.qsize()}/{self.upload_queue.maxsize}"
+                  f" 丢弃 {self.upload_queue.dropped}")
+        result = self.last_inference
+        if result:
+            status += (f" | 检测: {result['name']} {result['probabilities'][result['label']]:.0%}"
+                       f" ({result['latency'] * 1000:.1f}ms)")
+        return status
+    
+    def _render_stage(self, frame):
+        """渲染阶段：波形数据 -> base64图像"""
+        image, encoded = self.plot_waveforms(frame['data'])
+        return {'image': image, 'encoded': encoded, 'captured_at': frame['captured_at']}
+    
+    def _upload_stage(self, frame):
+        """上传阶段"""
+        start = time.perf_counter()
+        self.upload_waveform(frame['image'], frame['encoded'])
+        elapsed = time.perf_counter() - start
+        record(self.timings, '上传', elapsed)
+        # 上传耗时超过刷新间隔时收紧每帧字节预算，恢复后逐步放宽
+        if self.encoder.observe_upload(elapsed, self.scheduler.hop):
+            self.log(f"上传耗时 {elapsed * 1000:.0f}ms，每帧图像预算调整为 {self.encoder.budget / 1024:.0f}KB")
+
+    def _inference_stage(self, frame):
+        """推理阶段：检测窗口 -> 发作状态，状态变化或到达心跳间隔时上报"""
+        result = self.detector.predict(frame['data'], REALTIME_SAMPLE_RATE)
+        record(self.timings, '推理', result['latency'])
+        self.last_inference = result
+        state = result['state']
+        now = time.monotonic()
+        if state != self.reported_state or now - self.last_report >= REALTIME_STATE_HEARTBEAT:
+            if state != self.reported_state:
+                self.log(f"检测结果: {result['name']} (发作期概率 "
+                         f"{result['seizure_probability']:.0%})，状态 {state}")
+            if self.report_state(result, frame['captured_at']):
+                self.reported_state = state
+                self.last_report = now
+        
+    def _monitor_loop(self):
+        """实时监测采集循环：读取并滤波后交给渲染阶段"""
+        self.log("开始实时脑电监测...")
+        
+        # 1. 连接数据源
+        try:
+            self.source = self.create_source()
+            self.source.timings = self.timings
+            self.source.open()
+        except Exception as e:
+            self.log(f"数据源连接失败: {str(e)}")
+            print("请确保OpenBCI设备已连接并生成数据")
+            return
+        self.log(f"数据源: {self.source.describe()}")
+        
+        try:
+            self._acquire_loop()
+        finally:
+            self.source.close()
+    
+    def _acquire_loop(self):
+        """按步长读取数据源并交给渲染阶段"""
+        while self.running:
+            start_time = time.time()  # 循环起始时间
+            acquire_start = time.perf_counter()
+            
+            # 2. 读取并预处理数据
+            data = self.read_latest_data(REALTIME_SAMPLE_COUNT)
+            if data is None:
+                self.log("数据读取失败")
+            else:
+                # 3. 交给渲染与推理阶段（队列满时丢弃最旧的帧），附带最新样本的采集时间
+                captured_at = self.last_sample_time or start_time
+                if REALTIME_UPLOAD_IMAGES or not self.detector:
+                    self.render_queue.put({'data': data, 'captured_at': captured_at})
+                # 检测使用NaN修复后、未滤波的样本（与训练数据一致），凑满一个窗口后开始
+                if self.detector and len(self.raw) >= self.inference_samples:
+                    self.inference_queue.put({'data': self.raw.latest(self.inference_samples),
+                                              'captured_at': captured_at})
+            self.acquire_time = ewma(self.acquire_time, time.perf_counter() - acquire_start)
+            
+            # 4. 按采集（含滤波）、渲染、推理中最慢的耗时调整步长：超出预算时降低刷新率，
+            #    而不是让队列积压、间隔漂移；上传耗时不计入，网络慢不会降低采集与检测的频率
+            stage_times = [self.acquire_time] + [stage.avg_time for stage in self.compute_stages
+                                                 if stage.avg_time is not None]
+            cost = max(stage_times)
+            previous_hop = self.scheduler.hop
+            if self.scheduler.adapt(cost):
+                self.log(f"单帧耗时 {cost * 1000:.0f}ms，刷新间隔 {previous_hop:.2f}s -> {self.scheduler.hop:.2f}s")
+            
+            # 5. 等待到下一个截止时间（stop() 可立即唤醒）
+            self._stop_event.wait(self.scheduler.next_delay())  # 维持固定间隔
+
+
+# ===================== 独立运行（无界面） =====================
+def _timestamped(message):
+    print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+
+def main(argv=None):
+    global REALTIME_SOURCE, REALTIME_RECORDINGS_DIR, REALTIME_UDP_ADDRESS, REALTIME_PLOT_INTERVAL, \
+        REALTIME_MODEL_PATH, REALTIME_UPLOAD_IMAGES, REALTIME_TIMING_LOG
+    parser = argparse.ArgumentParser(description="实时脑电监测服务（无界面）")
+    parser.add_argument('--user-id', type=int, required=True, help="用户ID")
+    parser.add_argument('--source', default=REALTIME_SOURCE, choices=('file', 'udp', 'lsl', 'synthetic'),
+                        help="数据源")
+    parser.add_argument('--recordings-dir', default=REALTIME_RECORDINGS_DIR, help="OpenBCI 录制目录")
+    parser.add_argument('--udp', default=f"{REALTIME_UDP_ADDRESS[0]}:{REALTIME_UDP_ADDRESS[1]}",
+                        help="UDP 监听地址 host:port")
+    parser.add_argument('--interval', type=float, default=REALTIME_PLOT_INTERVAL, help="刷新间隔 (秒)")
+    parser.add_argument('--server', default=SERVER_URL, help="服务器基础地址")
+    parser.add_argument('--model', default=REALTIME_MODEL_PATH, help="发作检测模型 (model.onnx)")
+    parser.add_argument('--no-images', action='store_true', help="只上报检测结果，不上传波形图")
+    parser.add_argument('--timing-log', default=REALTIME_TIMING_LOG, help="分阶段耗时 JSON Lines 输出路径")
+    parser.add_argument('--status-every', type=float, default=30.0, help="输出运行状态的间隔 (秒)")
+    parser.add_argument('--duration', type=float, default=None, help="运行指定秒数后退出（测试用）")
+    args = parser.parse_args(argv)
+
+    REALTIME_SOURCE = args.source
+    REALTIME_RECORDINGS_DIR = args.recordings_dir
+    host, _, port = args.udp.rpartition(':')
+    REALTIME_UDP_ADDRESS = (host or '0.0.0.0', int(port))
+    REALTIME_PLOT_INTERVAL = args.interval
+    REALTIME_MODEL_PATH = args.model
+    REALTIME_UPLOAD_IMAGES = not args.no_images
+    REALTIME_TIMING_LOG = args.timing_log
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    monitor = RealTimeMonitor(args.user_id, _timestamped, None,
+                              client=ApiClient(args.server, log=_timestamped))
+    monitor.start()
+    deadline = time.monotonic() + args.duration if args.duration else None
+    last_status = time.monotonic()
+    while not stop.wait(0.5):
+        if not monitor.monitor_thread.is_alive():
+            # 数据源连接失败等原因导致采集线程退出
+            monitor.stop()
+            return 1
+        now = time.monotonic()
+        if now - last_status >= args.status_every:
+            last_status = now
+            _timestamped(f"{monitor.pipeline_status()}\n分阶段耗时 (ms):\n{monitor.timings.format()}")
+        if deadline and now >= deadline:
+            break
+    monitor.stop()
+    _timestamped(f"分阶段耗时 (ms):\n{monitor.timings.format()}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,155 @@
+"""
+录制目录监视
+
+OpenBCI GUI 开始新会话 (OpenBCISession_*) 或新建 OpenBCI-RAW-*.txt 时，需要把读取切换到新文件。
+原实现只在启动时确定一次文件，之后一直读取旧文件；而每次查找最新文件都要列出并 stat 整个目录树。
+
+- 安装了 watchdog 时：订阅文件系统事件 (inotify / ReadDirectoryChangesW / FSEvents)，新文件创建时立即得知
+- 否则轮询：每次只 stat 录制目录和当前会话目录两个目录的修改时间（新增子项时目录 mtime 会变化），
+  只有发生变化时才重新扫描
+"""
+
+import fnmatch
+import os
+import threading
+import time
+
+SESSION_PATTERN = 'OpenBCISession_*'
+FILE_PATTERN = 'OpenBCI-RAW-*.txt'
+
+
+def find_latest_recording(recordings_dir):
+    """
+    查找录制目录中最新会话的最新 OpenBCI-RAW 文件
+    :return: 文件路径，未找到时返回None
+    """
+    # 扫描会话目录 (格式: OpenBCISession_*)
+    sessions = [d for d in os.listdir(recordings_dir)
+                if d.startswith("OpenBCISession_")]
+    if not sessions:
+        return None
+    # 修改时间相同时按名称排序（会话与文件名中包含创建时间）
+    sessions.sort(key=lambda d: (os.path.getmtime(os.path.join(recordings_dir, d)), d), reverse=True)
+    latest_session = os.path.join(recordings_dir, sessions[0])
+
+    # 获取会话中的最新数据文件 (格式: OpenBCI-RAW-*.txt)
+    files = [f for f in os.listdir(latest_session)
+             if f.startswith("OpenBCI-RAW-") and f.endswith(".txt")]
+    if not files:
+        return None
+    files.sort(key=lambda f: (os.path.getmtime(os.path.join(latest_session, f)), f), reverse=True)
+    return os.path.join(latest_session, files[0])
+
+
+def is_recording_file(path):
+    """判断路径是否为会话目录中的 OpenBCI-RAW 文件"""
+    return (fnmatch.fnmatch(os.path.basename(path), FILE_PATTERN)
+            and fnmatch.fnmatch(os.path.basename(os.path.dirname(path)), SESSION_PATTERN))
+
+
+class RecordingWatcher:
+    """跟踪录制目录中当前活跃的 OpenBCI-RAW 文件"""
+
+    def __init__(self, recordings_dir, current=None, poll_interval=1.0, use_watchdog=True):
+        """
+        :param recordings_dir: OpenBCI 录制目录
+        :param current: 当前正在读取的文件
+        :param poll_interval: 轮询模式下两次检查的最小间隔 (秒)
+        :param use_watchdog: 是否尝试使用 watchdog 事件通知
+        """
+        self.recordings_dir = recordings_dir
+        self.current = current
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._pending = None  # 事件通知得到的新文件
+        self._observer = None
+        self._last_poll = 0.0
+        self._dir_mtimes = None
+        if use_watchdog:
+            self._start_observer()
+        if self._observer is None:
+            self._dir_mtimes = self._snapshot()
+
+    @property
+    def mode(self):
+        return 'watchdog' if self._observer is not None else 'polling'
+
+    # ---------- watchdog 事件通知 ----------
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    watcher._on_new_file(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    watcher._on_new_file(event.dest_path)
+
+        observer = Observer()
+        observer.schedule(Handler(), self.recordings_dir, recursive=True)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+
+    def _on_new_file(self, path):
+        if is_recording_file(path):
+            with self._lock:
+                self._pending = path
+
+    # ---------- 轮询 ----------
+    def _session_dir(self):
+        return os.path.dirname(self.current) if self.current else None
+
+    def _snapshot(self):
+        """录制目录与当前会话目录的修改时间"""
+        mtimes = []
+        for directory in (self.recordings_dir, self._session_dir()):
+            try:
+                mtimes.append(os.stat(directory).st_mtime_ns if directory else None)
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+    def _poll(self):
+        now = time.monotonic()
+        if now - self._last_poll < self.poll_interval:
+            return None
+        self._last_poll = now
+        snapshot = self._snapshot()
+        if snapshot == self._dir_mtimes:
+            return None
+        latest = find_latest_recording(self.recordings_dir)
+        self._dir_mtimes = snapshot
+        return latest
+
+    # ---------- 接口 ----------
+    def check(self):
+        """
+        检查是否出现了更新的录制文件
+        :return: 新文件路径；没有变化时返回None
+        """
+        if self._observer is not None:
+            with self._lock:
+                latest, self._pending = self._pending, None
+        else:
+            latest = self._poll()
+        if latest is None or latest == self.current:
+            return None
+        self.current = latest
+        if self._observer is None:
+            # 会话目录可能已变化，重新记录快照
+            self._dir_mtimes = self._snapshot()
+        return latest
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
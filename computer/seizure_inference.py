@@ -0,0 +1,207 @@
+"""
+本地癫痫发作检测（ONNX Runtime）
+
+原流程中桌面端只上传波形图，检测要等整个文件经 TCP 发送到开发板后才进行。
+这里在实时监测中直接运行 train/pth2onnx.py 导出的 model.onnx：
+
+- 前端与训练时 train/dsp.py 的 pre_stft 一致：256Hz、10秒窗口、Hann窗长256、步长128、
+  保留60Hz以下的幅度谱，得到 (1, 18, 21, 60) 的输入
+- 采集采样率 (OpenBCI 250Hz) 与训练采样率不同时线性插值重采样；通道数不足18时补零
+- 训练时保存了 mean.npy / std.npy 时，与模型放在同一目录即按训练方式标准化
+- ONNX Runtime 会话、重采样索引、STFT 中间数组与输入/输出缓冲区只创建一次，
+  通过 IOBinding 绑定到固定的内存，每个窗口不再分配新数组
+
+onnxruntime 只在创建 SeizureDetector 时导入，未安装时实时监测仍可只上传波形图。
+"""
+
+import os
+import time
+
+import numpy as np
+
+MODEL_SAMPLE_RATE = 256  # 训练数据采样率 (Hz)
+MODEL_CHANNELS = 18  # 模型输入通道数
+WINDOW_SECONDS = 10  # 每次检测的时间窗口 (秒)
+STFT_WIN_LEN = 256  # STFT 窗长 (样本数)
+STFT_HOP = 128  # STFT 步长 (样本数)，即 pre_stft 的 overlap_len
+STFT_CUTOFF_HZ = 60  # 保留的最高频率 (Hz)
+CLASS_NAMES = ['发作间期', '发作前期', '发作期', '发作后期']  # 与训练标签 0-3 对应
+SEIZURE_CLASS = 2  # 判定为发作 (state=1) 的类别
+
+
+class StftFrontEnd:
+    """与 dsp.pre_stft 等价的向量化 STFT，所有中间数组预先分配"""
+
+    def __init__(self, channels=MODEL_CHANNELS, length=MODEL_SAMPLE_RATE * WINDOW_SECONDS,
+                 win_len=STFT_WIN_LEN, hop=STFT_HOP, cutoff_hz=STFT_CUTOFF_HZ, sample_rate=MODEL_SAMPLE_RATE):
+        """
+        :param channels: 通道数
+        :param length: 每个窗口的样本数
+        """
+        self.channels = channels
+        self.length = length
+        self.win_len = win_len
+        self.hop = hop
+        self.cutoff = int(np.ceil(cutoff_hz * win_len / sample_rate))
+        self.frames = int((length - win_len) / hop + 3)
+        # scipy.signal.get_window('hann', N) 为周期 Hann 窗
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(win_len) / win_len)).astype(np.float32)
+        # 左右各补 hop 个零，与 pre_stft 的边界处理相同
+        self._padded = np.zeros((channels, length + 2 * hop), dtype=np.float32)
+        frames = np.lib.stride_tricks.sliding_window_view(self._padded, win_len, axis=1)
+        self._frames = frames[:, ::hop][:, :self.frames]  # (通道, 帧, 窗长) 视图，不复制数据
+        self._windowed = np.empty((channels, self.frames, win_len), dtype=np.float32)
+
+    @property
+    def output_shape(self):
+        return (self.channels, self.frames, self.cutoff)
+
+    def signal_buffer(self):
+        """写入待变换信号的数组 (通道, 样本数)"""
+        return self._padded[:, self.hop:self.hop + self.length]
+
+    def transform(self, out):
+        """
+        对 signal_buffer() 中的信号做 STFT
+        :param out: 输出数组，形状为 output_shape
+        """
+        np.multiply(self._frames, self.window, out=self._windowed)
+        spectrum = np.fft.rfft(self._windowed, axis=2)
+        np.abs(spectrum[:, :, :self.cutoff], out=out)
+        return out
+
+
+class SeizureDetector:
+    """对滑动窗口运行 STFT 前端与 ONNX 模型，输出各类别概率和发作状态"""
+
+    def __init__(self, model_path, threads=1, threshold=0.5):
+        """
+        :param model_path: model.onnx 路径，同目录下的 mean.npy / std.npy 用于标准化
+        :param threads: ONNX Runtime 线程数（单个窗口很小，多线程反而增加调度开销）
+        :param threshold: 发作类别概率达到该值时判定为发作
+        """
+        import onnxruntime as ort  # 导入约需数百毫秒，只在启用推理时导入
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.threshold = threshold
+        self.front_end = StftFrontEnd()
+
+        self._input = np.zeros((1,) + self.front_end.output_shape, dtype=np.float32)
+        self._output = np.zeros((1, len(CLASS_NAMES)), dtype=np.float32)
+        self._binding = self.session.io_binding()
+        self._binding.bind_input(self.session.get_inputs()[0].name, 'cpu', 0, np.float32,
+                                 self._input.shape, self._input.ctypes.data)
+        self._binding.bind_output(self.session.get_outputs()[0].name, 'cpu', 0, np.float32,
+                                  self._output.shape, self._output.ctypes.data)
+
+        self.mean, self.std = self._load_normalization(os.path.dirname(os.path.abspath(model_path)))
+        self._resample_key = None  # 重采样索引对应的 (输入样本数, 采样率)
+        self._index = None
+        self._weight = None
+
+    @staticmethod
+    def _load_normalization(directory):
+        """读取训练时保存的标准化参数，不存在时不做标准化"""
+        mean_path = os.path.join(directory, 'mean.npy')
+        std_path = os.path.join(directory, 'std.npy')
+        if not (os.path.exists(mean_path) and os.path.exists(std_path)):
+            return None, None
+        mean = np.load(mean_path).astype(np.float32)
+        std = np.load(std_path).astype(np.float32) + 1e-8
+        return mean, std
+
+    @staticmethod
+    def input_samples(sample_rate):
+        """在采集采样率下，一个检测窗口需要的样本数"""
+        return int(round(WINDOW_SECONDS * sample_rate))
+
+    def _resample(self, data, sample_rate):
+        """把 (样本数, 通道数) 数据线性插值到模型采样率，写入 STFT 输入数组"""
+        count = len(data)
+        if self._resample_key != (count, sample_rate):
+            # 输出样本对应的输入位置只取决于样本数和采样率，计算一次后复用
+            length = self.front_end.length
+            position = np.arange(length) * (count - 1) / max(length - 1, 1)
+            self._index = np.minimum(position.astype(np.int64), count - 2)
+            self._weight = (position - self._index).astype(np.float32)
+            self._resample_key = (count, sample_rate)
+        target = self.front_end.signal_buffer()
+        channels = min(data.shape[1], MODEL_CHANNELS)
+        rows = data.T[:channels]
+        target[:channels] = rows[:, self._index] * (1 - self._weight) + rows[:, self._index + 1] * self._weight
+        target[channels:] = 0  # 缺少的通道补零
+
+    def predict(self, data, sample_rate):
+        """
+        检测一个窗口
+        :param data: 形状为 (样本数, 通道数) 的脑电数据，样本数为 input_samples(sample_rate)
+        :param sample_rate: 数据采样率 (Hz)
+        :return: {'probabilities', 'label', 'name', 'seizure_probability', 'state', 'latency'}，latency 单位为秒
+        """
+        start = time.perf_counter()
+        self._resample(data, sample_rate)
+        features = self._input[0]
+        self.front_end.transform(features)
+        if self.mean is not None:
+            features -= self.mean[0]
+            features /= self.std[0]
+        self.session.run_with_iobinding(self._binding)
+
+        logits = self._output[0].astype(np.float64)
+        probabilities = np.exp(logits - logits.max())
+        probabilities /= probabilities.sum()
+        label = int(np.argmax(probabilities))
+        seizure_probability = float(probabilities[SEIZURE_CLASS])
+        return {
+            'probabilities': probabilities,
+            'label': label,
+            'name': CLASS_NAMES[label],
+            'seizure_probability': seizure_probability,
+            'state': int(seizure_probability >= self.threshold),
+            'latency': time.perf_counter() - start,
+        }
+
+
+def _benchmark(model_path=None, windows=200):
+    """对比 dsp.pre_stft 与向量化前端的结果和耗时；提供模型时测量单窗口推理延迟"""
+    import sys
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'train'))
+    import dsp
+
+    rng = np.random.default_rng(0)
+    signal_window = rng.normal(0, 50, size=(MODEL_CHANNELS, MODEL_SAMPLE_RATE * WINDOW_SECONDS)).astype(np.float32)
+    start = time.perf_counter()
+    expected = dsp.pre_stft(signal_window[np.newaxis], MODEL_SAMPLE_RATE, STFT_WIN_LEN, STFT_HOP, STFT_CUTOFF_HZ)[0]
+    reference_time = time.perf_counter() - start
+
+    front_end = StftFrontEnd()
+    out = np.empty(front_end.output_shape, dtype=np.float32)
+    front_end.signal_buffer()[:] = signal_window
+    start = time.perf_counter()
+    for _ in range(windows):
+        front_end.transform(out)
+    vectorized_time = (time.perf_counter() - start) / windows
+    error = np.max(np.abs(out - expected)) / np.max(np.abs(expected))
+    print(f"STFT 前端: pre_stft {reference_time * 1000:.1f}ms, 向量化 {vectorized_time * 1000:.2f}ms, "
+          f"最大相对误差 {error:.1e}")
+
+    if model_path:
+        detector = SeizureDetector(model_path)
+        data = rng.normal(0, 50, size=(SeizureDetector.input_samples(250), 8))
+        latencies = [detector.predict(data, 250)['latency'] for _ in range(windows)]
+        print(f"单窗口检测 (250Hz 8通道): 中位数 {np.median(latencies) * 1000:.2f}ms, "
+              f"P95 {np.percentile(latencies, 95) * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="STFT 前端一致性与推理延迟测试")
+    parser.add_argument('--model', default=None, help="model.onnx 路径")
+    args = parser.parse_args()
+    _benchmark(args.model)
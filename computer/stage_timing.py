@@ -0,0 +1,117 @@
+"""
+实时流水线分阶段计时
+
+原实现只记录每个周期“绘图和上传”的总耗时，诊所电脑上超出刷新间隔时无法判断是哪一步慢。
+这里为文件发现、解析、NaN修复、滤波、渲染、图像编码、base64、上传（以及本地推理）
+分别计时，每个阶段保留最近 window 次的耗时，计算 p50 / p95 / 最大值；
+可选把每次计时以 JSON Lines 追加到本地文件，便于离线分析。
+"""
+
+import json
+import threading
+import time
+import unicodedata
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+# 显示顺序（未列出的阶段排在后面）
+STAGES = ['文件发现', '解析', 'NaN修复', '滤波', '渲染', '图像编码', 'base64', '上传', '推理']
+WINDOW = 200  # 每个阶段保留的最近计时次数
+FLUSH_INTERVAL = 1.0  # JSON Lines 文件的刷新间隔 (秒)
+
+
+class StageTimings:
+    """各阶段最近若干次耗时的滚动统计（线程安全）"""
+
+    def __init__(self, window=WINDOW, dump_path=None, extra=None):
+        """
+        :param window: 每个阶段保留的最近计时次数
+        :param dump_path: JSON Lines 输出路径，为None时不写文件
+        :param extra: 写入每行记录的附加字段，例如 {'user_id': 1001}
+        """
+        self.window = window
+        self.extra = dict(extra or {})
+        self._samples = {}  # 阶段 -> 最近耗时 (秒)
+        self._counts = {}  # 阶段 -> 累计次数
+        self._lock = threading.Lock()
+        self._dump = open(dump_path, 'a', encoding='utf-8') if dump_path else None
+        self._last_flush = time.monotonic()
+
+    def record(self, stage, seconds):
+        """记录一次耗时"""
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+                self._counts[stage] = 0
+            samples.append(seconds)
+            self._counts[stage] += 1
+            if self._dump is not None:
+                line = dict(self.extra, time=round(time.time(), 3), stage=stage, ms=round(seconds * 1000, 3))
+                self._dump.write(json.dumps(line, ensure_ascii=False) + '\n')
+                now = time.monotonic()
+                if now - self._last_flush >= FLUSH_INTERVAL:
+                    self._dump.flush()
+                    self._last_flush = now
+
+    @contextmanager
+    def measure(self, stage):
+        """计时上下文：with timings.measure('滤波'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def summary(self):
+        """
+        各阶段统计
+        :return: {阶段: {'count', 'p50', 'p95', 'max', 'last'}}，耗时单位为秒，按 STAGES 顺序
+        """
+        with self._lock:
+            snapshot = {stage: (np.array(samples), self._counts[stage]) for stage, samples in self._samples.items()}
+        order = sorted(snapshot, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES))
+        result = {}
+        for stage in order:
+            values, count = snapshot[stage]
+            p50, p95 = np.percentile(values, [50, 95])
+            result[stage] = {'count': count, 'p50': float(p50), 'p95': float(p95),
+                             'max': float(values.max()), 'last': float(values[-1])}
+        return result
+
+    def format(self):
+        """多行文本表格（毫秒）"""
+        summary = self.summary()
+        if not summary:
+            return "暂无计时数据"
+        lines = [f"{_pad('阶段', 10)}{'p50':>9}{'p95':>9}{_pad('最大', 9, right=True)}{_pad('次数', 7, right=True)}"]
+        for stage, stats in summary.items():
+            lines.append(f"{_pad(stage, 10)}{stats['p50'] * 1000:>9.1f}{stats['p95'] * 1000:>9.1f}"
+                         f"{stats['max'] * 1000:>9.1f}{stats['count']:>7d}")
+        return "\n".join(lines)
+
+    def close(self):
+        with self._lock:
+            if self._dump is not None:
+                self._dump.close()
+                self._dump = None
+
+
+def _pad(text, width, right=False):
+    """按显示宽度（中文占两列）补齐空格"""
+    used = sum(2 if unicodedata.east_asian_width(c) in 'WF' else 1 for c in text)
+    padding = ' ' * max(0, width - used)
+    return padding + text if right else text + padding
+
+
+def measure(timings, stage):
+    """timings 为None时不计时的计时上下文"""
+    return timings.measure(stage) if timings is not None else nullcontext()
+
+
+def record(timings, stage, seconds):
+    """timings 为None时忽略的计时记录"""
+    if timings is not None:
+        timings.record(stage, seconds)
@@ -0,0 +1,79 @@
+"""
+流式滤波器组
+
+原实现每个 5 秒窗口都重新设计 Butterworth 系数，逐通道调用 filtfilt，
+并丢弃前 30 个边缘瞬态样本。这里缓存二阶节 (SOS) 系数，跨数据块保存滤波器状态 zi，
+对全部通道一次向量化调用 sosfilt：每次只处理新到达的样本，相邻窗口连续、无需丢弃边缘。
+
+滤波链配置示例：
+    [('lowpass', 50.0), ('highpass', 0.5), ('notch', 50.0)]
+每项为 (类型, 频率[, 参数])，lowpass/highpass 的参数为阶数 (默认4)，notch 的参数为品质因数 (默认30)
+
+scipy.signal 导入耗时约1秒，在首次设计滤波器时才导入，不拖慢程序启动。
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=32)
+def design_sos(kind, freq, fs, param=None):
+    """
+    设计单级滤波器的 SOS 系数（结果缓存）
+    :param kind: 'lowpass' / 'highpass' / 'notch'
+    :param freq: 截止频率或陷波频率 (Hz)
+    :param fs: 采样率 (Hz)
+    :param param: 阶数或品质因数
+    """
+    from scipy import signal
+    if kind in ('lowpass', 'highpass'):
+        order = param or 4
+        btype = 'low' if kind == 'lowpass' else 'high'
+        return signal.butter(order, freq, btype=btype, fs=fs, output='sos')
+    if kind == 'notch':
+        b, a = signal.iirnotch(freq, param or 30.0, fs=fs)
+        return signal.tf2sos(b, a)
+    raise ValueError(f"不支持的滤波器类型: {kind}")
+
+
+class StreamingFilterBank:
+    """跨数据块保持状态的多通道级联滤波器"""
+
+    def __init__(self, chain, fs, channels):
+        """
+        :param chain: 滤波链配置
+        :param fs: 采样率 (Hz)
+        :param channels: 通道数
+        """
+        self.chain = list(chain)
+        self.fs = fs
+        self.channels = channels
+        self.sos = np.vstack([self._design(stage, fs) for stage in self.chain])
+        self.zi = None
+
+    @staticmethod
+    def _design(stage, fs):
+        kind, freq = stage[0], float(stage[1])
+        param = stage[2] if len(stage) > 2 else None
+        return design_sos(kind, freq, fs, param)
+
+    def process(self, chunk):
+        """
+        滤波新到达的样本
+        :param chunk: 形状为 (样本数, 通道数) 的数组
+        :return: 同形状的滤波结果
+        """
+        if len(chunk) == 0:
+            return chunk
+        from scipy import signal
+        if self.zi is None:
+            # 以首个样本为稳态初始化，避免启动瞬态
+            zi = signal.sosfilt_zi(self.sos)  # (节数, 2)
+            self.zi = zi[:, :, np.newaxis] * chunk[0][np.newaxis, np.newaxis, :]
+        filtered, self.zi = signal.sosfilt(self.sos, chunk, axis=0, zi=self.zi)
+        return filtered
+
+    def reset(self):
+        """清除滤波器状态（数据源不连续时调用）"""
+        self.zi = None
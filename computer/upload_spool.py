@@ -0,0 +1,192 @@
+"""
+上传失败帧的磁盘暂存与补传
+
+网络中断时离线波形图上传失败即永久丢失。这里把上传失败的请求（接口路径 + JSON 负载）
+写入用户目录下的 SQLite 队列，总大小超过上限时丢弃最旧的帧；后台补传线程在网络恢复后
+按写入顺序（最旧优先）分批重新发送。
+
+只暂存服务器会保存的数据（离线波形图写入 EEGWaveform 表）。实时波形图是“只看最新”的帧，
+网络恢复时服务器已有更新的实时帧，补传只会占用上行带宽，因此上传失败时直接丢弃。
+
+补传线程与实时上传相互独立：实时帧从不排在暂存帧之后，补传失败只会让补传线程退避；
+补传线程按 pace 控制发送间隔，积压再多也不会耗尽服务器的限流令牌。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_SPOOL_PATH = os.path.join(os.path.expanduser('~'), '.epilepsy', 'upload_spool.db')
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024  # 暂存总大小上限 (字节)
+
+
+class UploadSpool:
+    """基于 SQLite 的先进先出上传队列，可在多个线程间共享"""
+
+    def __init__(self, path=DEFAULT_SPOOL_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param path: 数据库文件路径
+        :param max_bytes: 负载总大小上限，超过时丢弃最旧的帧
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0  # 因超过上限而丢弃的帧数
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " path TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL)")
+
+    def push(self, path, payload):
+        """
+        暂存一次失败的上传
+        :param path: 接口路径
+        :param payload: JSON 负载
+        """
+        body = json.dumps(payload, separators=(',', ':'))
+        with self._lock:
+            self._conn.execute("INSERT INTO spool (path, payload, size, created_at) VALUES (?, ?, ?, ?)",
+                               (path, body, len(body), time.time()))
+            self._trim()
+
+    def _trim(self):
+        """超过大小上限时按写入顺序删除最旧的帧（调用方持有锁）"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM spool").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        ids = []
+        for row_id, size in self._conn.execute("SELECT id, size FROM spool ORDER BY id"):
+            ids.append(row_id)
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in ids])
+        self.dropped += len(ids)
+
+    def peek(self, limit):
+        """
+        取出最旧的若干帧（不删除）
+        :return: [(id, 接口路径, 负载), ...]
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT id, path, payload FROM spool ORDER BY id LIMIT ?",
+                                      (limit,)).fetchall()
+        return [(row_id, path, json.loads(body)) for row_id, path, body in rows]
+
+    def remove(self, row_id):
+        """删除已成功补传的帧"""
+        with self._lock:
+            self._conn.execute("DELETE FROM spool WHERE id = ?", (row_id,))
+
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM spool").fetchone()
+        return {'frames': count, 'bytes': size, 'dropped': self.dropped}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SpoolReplayer(threading.Thread):
+    """后台补传线程：网络恢复后按最旧优先分批重发暂存帧"""
+
+    def __init__(self, spool, client, sign, batch_size=20, interval=5.0, max_backoff=60.0, pace=0.5, log=None):
+        """
+        :param spool: UploadSpool
+        :param client: ApiClient
+        :param sign: 生成签名请求头的函数
+        :param batch_size: 每批补传帧数
+        :param interval: 空闲时检查间隔 (秒)
+        :param max_backoff: 补传失败后的最长等待时间 (秒)
+        :param pace: 相邻两帧补传之间的最短间隔 (秒)
+        :param log: 日志函数
+        """
+        super().__init__(name="补传", daemon=True)
+        self.spool = spool
+        self.client = client
+        self.sign = sign
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.pace = pace
+        self.log = log
+        self.replayed = 0  # 已补传帧数
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._running = True
+
+    def notify_online(self):
+        """实时上传成功时调用，立即开始补传"""
+        self._wake.set()
+
+    def _send(self, path, payload):
+        """
+        补传单帧（不重试）
+        :return: 'ok' 成功，'drop' 服务器拒绝该帧（不再重试），'retry' 稍后重试
+        """
+        try:
+            response = self.client.post(path, payload, headers=self.sign, timeout=10,
+                                        deadline=time.monotonic())
+        except Exception:
+            return 'retry'
+        if response.status_code == 200:
+            return 'ok'
+        if response.status_code == 429 or response.status_code >= 500:
+            return 'retry'
+        if self.log:
+            self.log(f"补传被服务器拒绝，丢弃该帧: {response.status_code} - {response.text[:100]}")
+        return 'drop'
+
+    def drain_batch(self):
+        """
+        补传一批
+        :return: 本批是否全部完成（False 表示网络仍不可用）
+        """
+        for index, (row_id, path, payload) in enumerate(self.spool.peek(self.batch_size)):
+            # 按 pace 间隔发送，为实时帧保留服务器限流令牌
+            if not self._running or (index and self._stopped.wait(self.pace)):
+                return False
+            result = self._send(path, payload)
+            if result == 'retry':
+                return False
+            self.spool.remove(row_id)
+            if result == 'ok':
+                self.replayed += 1
+        return True
+
+    def run(self):
+        delay = self.interval
+        while self._running:
+            self._wake.wait(delay)
+            self._wake.clear()
+            if not self._running:
+                break
+            pending = self.spool.stats()['frames']
+            if not pending:
+                delay = self.interval
+                continue
+            if self.drain_batch():
+                delay = self.pace  # 仍有积压则按相同间隔继续下一批
+                if self.log and self.spool.stats()['frames'] == 0:
+                    self.log(f"暂存帧补传完成，共补传 {self.replayed} 帧")
+            else:
+                delay = min(self.max_backoff, max(self.interval, delay * 2))
+
+    def stop(self):
+        self._running = False
+        self._stopped.set()
+        self._wake.set()
@@ -0,0 +1,106 @@
+"""
+常驻画布的波形渲染器
+
+原实现每个周期新建 figure、逐个创建子图、调用 tight_layout，保存后再关闭，
+这通常是“绘图和上传耗时”中占比最大的部分。这里只在首次使用时创建 Figure、
+坐标轴和 Line2D，tight_layout 只在第一帧执行一次。
+
+之后每帧只变化曲线和Y轴（范围随数据变化），其余部分（X轴刻度、网格、边框）
+在首帧渲染后缓存为背景；每帧恢复背景，仅重绘Y轴与曲线，再把 Agg 画布像素
+编码为PNG。不依赖 pyplot，可在任意线程中使用。
+"""
+
+from io import BytesIO
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+from PIL import Image
+
+FIGURE_WIDTH = 15.0  # 图像宽度 (英寸)
+INCHES_PER_CHANNEL = 2.25  # 每个通道子图的高度 (英寸)，8通道时为原来的 15x18 英寸
+
+
+class WaveformRenderer:
+    """多通道脑电波形渲染器"""
+
+    def __init__(self, channels, sample_count, sample_rate, width=FIGURE_WIDTH, dpi=100):
+        """
+        :param channels: 通道数
+        :param sample_count: 每帧样本数
+        :param sample_rate: 采样率 (Hz)
+        :param width: 图像宽度 (英寸)
+        :param dpi: 分辨率，降低可减少渲染与编码耗时
+        """
+        self.channels = channels
+        self.sample_count = sample_count
+        self.dpi = dpi
+        self.figure = Figure(figsize=(width, INCHES_PER_CHANNEL * channels), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self._buffer = BytesIO()
+        self._background = None  # 缓存的静态背景
+
+        # 生成时间轴 (秒)
+        time_axis = np.arange(sample_count) / sample_rate
+        axes = self.figure.subplots(channels, 1, sharex=True, squeeze=False)[:, 0]
+        self.axes = list(axes)
+        self.lines = []
+        for i, ax in enumerate(self.axes):
+            line, = ax.plot(time_axis, np.zeros(sample_count))
+            self.lines.append(line)
+            ax.set_ylabel(f'Ch {i} (μV)')  # Y轴标签
+            ax.grid(True, alpha=0.3)  # 半透明网格
+            ax.yaxis.set_major_locator(MaxNLocator(nbins=5))
+            # 曲线与Y轴每帧变化，不计入缓存背景
+            line.set_animated(True)
+            ax.yaxis.set_animated(True)
+            ax.set_xlim(time_axis[0], time_axis[-1] if sample_count > 1 else 1)
+        # 仅底部子图显示X轴
+        self.axes[-1].set_xlabel('Time (s)')
+
+    def matches(self, sample_count, channels):
+        """判断当前画布能否直接用于给定尺寸的数据"""
+        return self.sample_count == sample_count and self.channels == channels
+
+    def update(self, data):
+        """更新曲线数据与Y轴范围（不渲染）"""
+        # 所有通道使用相同的纵向跨度（最大峰峰值的10/3倍），以各自均值为中心
+        height_max = float(np.ptp(data, axis=0).max()) or 1.0
+        means = data.mean(axis=0)
+        half = height_max / 3 * 5
+        for i, (line, ax) in enumerate(zip(self.lines, self.axes)):
+            line.set_ydata(data[:, i])
+            ax.set_ylim(means[i] - half, means[i] + half)
+
+    def draw(self, data):
+        """渲染一帧到 Agg 画布"""
+        if self._background is None:
+            # 首帧：调整布局并渲染静态部分作为背景
+            self.figure.tight_layout()
+            self.canvas.draw()
+            self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.update(data)
+        self.canvas.restore_region(self._background)
+        for line, ax in zip(self.lines, self.axes):
+            ax.draw_artist(ax.yaxis)
+            ax.draw_artist(line)
+
+    def to_image(self):
+        """将画布像素包装为 PIL 图像（RGB，不含透明通道）"""
+        width, height = self.canvas.get_width_height()
+        rgba = Image.frombuffer('RGBA', (width, height), self.canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+        return rgba.convert('RGB')
+
+    def render_png(self, data):
+        """
+        渲染一帧并编码为PNG
+        :param data: 形状为 (样本数, 通道数) 的数据
+        :return: PNG 字节串
+        """
+        self.draw(data)
+        buffer = self._buffer
+        buffer.seek(0)
+        buffer.truncate()
+        self.to_image().save(buffer, format='PNG')
+        return buffer.getvalue()
@@ -0,0 +1,130 @@
+"""
+癫痫发作告警分发
+
+receive_lotdata() 检测到 epilepsy_state 由非 1 变为 1 时向本模块的事件总线发布告警，
+总线按用户维护订阅者列表，直接把告警推送到各订阅者的队列中，由 SSE / 长轮询接口
+送达看护人。每个用户保留最近的告警用于短暂断线后的补发（按告警ID续传）。
+告警ID取自微秒时间戳并保证递增，服务重启或重连到其他 worker 后客户端持有的ID仍可比较
+（微秒值不超过 2^53，小程序等 JavaScript 客户端可精确表示）。
+
+注意：总线位于进程内，多 worker 部署时订阅与发布需落在同一 worker 上。
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class Subscriber:
+    """单个订阅者的告警队列"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._queue = deque()
+        self._cond = threading.Condition()
+
+    def push(self, alert):
+        with self._cond:
+            self._queue.append(alert)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """取出一条告警，超时返回None"""
+        with self._cond:
+            if not self._queue:
+                self._cond.wait(timeout)
+            return self._queue.popleft() if self._queue else None
+
+    def drain(self):
+        """取出队列中全部告警"""
+        with self._cond:
+            alerts = list(self._queue)
+            self._queue.clear()
+            return alerts
+
+
+class AlertBus:
+    """按用户分发告警的进程内事件总线"""
+
+    def __init__(self, replay_size=20, replay_window=300.0):
+        """
+        :param replay_size: 每个用户保留的最近告警条数
+        :param replay_window: 补发的时间窗口 (秒)，超过窗口的告警不再补发
+        """
+        self.replay_size = replay_size
+        self.replay_window = replay_window
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(list)
+        self._recent = defaultdict(lambda: deque(maxlen=self.replay_size))
+        self._last_id = 0
+        self.published = 0
+        self.delivered = 0
+
+    def publish(self, user_id, **fields):
+        """
+        发布告警并立即推送给该用户的全部订阅者
+        :return: 告警字典（含递增ID与发布时间）
+        """
+        with self._lock:
+            self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+            alert = dict(fields, id=self._last_id, user_id=user_id, published_at=time.time())
+            self._recent[user_id].append(alert)
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self.published += 1
+            self.delivered += len(subscribers)
+        for subscriber in subscribers:
+            subscriber.push(alert)
+        return alert
+
+    def missed_since(self, user_id, last_id):
+        """返回ID大于 last_id 且仍在补发窗口内的告警"""
+        with self._lock:
+            return self._missed_locked(user_id, last_id)
+
+    def _missed_locked(self, user_id, last_id):
+        cutoff = time.time() - self.replay_window
+        return [a for a in self._recent.get(user_id, ())
+                if a['id'] > last_id and a['published_at'] >= cutoff]
+
+    def subscribe(self, user_id, last_id=None):
+        """
+        订阅用户告警；提供 last_id 时先补发断线期间错过的告警
+        注册与补发在同一把锁内完成：之前发布的告警只经补发送达，之后发布的只经实时推送送达，不会重复
+        """
+        subscriber = Subscriber(user_id)
+        with self._lock:
+            self._subscribers[user_id].append(subscriber)
+            if last_id is not None:
+                for alert in self._missed_locked(user_id, last_id):
+                    subscriber.push(alert)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id)
+            if subscribers and subscriber in subscribers:
+                subscribers.remove(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.user_id]
+
+    def wait(self, user_id, since, timeout):
+        """
+        长轮询：有错过的告警立即返回，否则等待新告警直到超时
+        :return: 告警列表（可能为空）
+        """
+        subscriber = self.subscribe(user_id, since)
+        try:
+            first = subscriber.get(timeout)
+            if first is None:
+                return []
+            return [first] + subscriber.drain()
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'published': self.published,
+                'delivered': self.delivered,
+                'subscribers': sum(len(s) for s in self._subscribers.values())
+            }
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from functools import wraps
@@ -7,10 +7,18 @@ import os
 import logging
 import json
 import hashlib
+import math
 import argparse
 import psutil  
 import base64
 import requests
+import time
+
+from frame_store import SharedFrameStore
+from rate_limit import TokenBucketLimiter, retry_after_header
+from dedup import create_deduplicator
+from health_cache import HealthDataCache, VersionTable
+from alerts import AlertBus
 
 
 load_dotenv()
@@ -171,6 +179,61 @@ def iot_signature_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# 数据接收接口限流配置（按设备名 / 用户ID 分桶）
+LOTDATA_LIMITER = TokenBucketLimiter(
+    rate=float(os.getenv('LOTDATA_RATE', '2')),
+    burst=float(os.getenv('LOTDATA_BURST', '10'))
+)
+WAVEFORM_UPLOAD_LIMITER = TokenBucketLimiter(
+    rate=float(os.getenv('WAVEFORM_UPLOAD_RATE', '5')),
+    burst=float(os.getenv('WAVEFORM_UPLOAD_BURST', '20'))
+)
+
+def lotdata_rate_key():
+    """物联网数据按设备名限流，无法解析时按来源地址"""
+    data = request.get_json(force=True, silent=True)
+    if isinstance(data, dict) and data.get('devicename'):
+        return f"device:{data['devicename']}"
+    return f"addr:{request.remote_addr}"
+
+def waveform_rate_key():
+    """波形图上传按用户ID限流，无法解析时按来源地址"""
+    data = request.get_json(force=True, silent=True)
+    if isinstance(data, dict) and data.get('user_id'):
+        return f"user:{data['user_id']}"
+    return f"addr:{request.remote_addr}"
+
+# 物联网消息去重（平台重试投递时直接确认，不重复写库）
+LOTDATA_DEDUP = create_deduplicator(
+    mode=os.getenv('LOTDATA_DEDUP_MODE', 'exact'),
+    window=float(os.getenv('LOTDATA_DEDUP_WINDOW', '600')),
+    capacity=int(os.getenv('LOTDATA_DEDUP_CAPACITY', '100000'))
+)
+
+# 癫痫发作告警总线（epilepsy_state 变为 1 时推送给看护人）
+ALERT_BUS = AlertBus(
+    replay_size=int(os.getenv('ALERT_REPLAY_SIZE', '20')),
+    replay_window=float(os.getenv('ALERT_REPLAY_WINDOW', '300'))
+)
+ALERT_HEARTBEAT_INTERVAL = 15  # SSE 心跳间隔 (秒)
+
+# 创建限流装饰器（放在签名验证之后，避免伪造请求耗尽合法设备的令牌）
+def rate_limited(limiter, key_func):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = key_func()
+            allowed, retry_after = limiter.acquire(key)
+            if not allowed:
+                logger.warning(f"请求被限流: {key}, 建议 {retry_after:.2f} 秒后重试")
+                return jsonify({
+                    'success': False,
+                    'message': 'Too many requests'
+                }), 429, {'Retry-After': retry_after_header(retry_after)}
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
 # 签名验证函数
 def verify_signature(signature, timestamp, nonce):
     """验证腾讯物联网平台的签名"""
@@ -210,12 +273,31 @@ def log_request_info():
 
 # 配置数据库
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(basedir, "health_data.db")}'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
+    'DATABASE_URL', f'sqlite:///{os.path.join(basedir, "health_data.db")}')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # 创建 SQLAlchemy 实例并绑定到应用
 db = SQLAlchemy(app)
 
+# 跨 worker 共享的最新波形帧存储（避免每次轮询都查询 SQLite）
+FRAME_STORE_PATH = os.getenv('FRAME_STORE_PATH', os.path.join(basedir, 'latest_frames.bin'))
+FRAME_STORE_SLOTS = int(os.getenv('FRAME_STORE_SLOTS', '64'))
+FRAME_STORE_SLOT_SIZE = int(os.getenv('FRAME_STORE_SLOT_SIZE', str(2 * 1024 * 1024)))
+frame_store = SharedFrameStore(FRAME_STORE_PATH, FRAME_STORE_SLOTS, FRAME_STORE_SLOT_SIZE)
+
+# 健康数据读穿缓存：版本号表跨 worker 共享，缓存本身每个 worker 一份
+HEALTH_VERSION_PATH = os.getenv('HEALTH_VERSION_PATH', os.path.join(basedir, 'health_versions.bin'))
+health_versions = VersionTable(HEALTH_VERSION_PATH)
+health_cache = HealthDataCache(max_entries=int(os.getenv('HEALTH_CACHE_SIZE', '1024')))
+
+def to_int_user_id(user_id):
+    """将请求中的用户ID转换为整数，非法时返回None"""
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return None
+
 # 定义用户模型
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -262,6 +344,16 @@ class DeviceData(db.Model):
     def __repr__(self):
         return f'<DeviceData {self.device_name} - {self.timestamp}>'
 
+class DesktopDetection(db.Model):
+    """桌面端本地模型的发作检测结果（每个用户一条，不写入 DeviceData、不触发告警）"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, unique=True, index=True)
+    device_name = db.Column(db.String(80))
+    state = db.Column(db.Integer)  # 0-正常, 1-疑似发作
+    probabilities = db.Column(db.String(120))  # 各类别概率，逗号分隔
+    timestamp = db.Column(db.DateTime, nullable=False)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 # 添加用户与设备关联模型
 class UserDevice(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -392,13 +484,22 @@ def get_health_data():
             logger.error("缺少用户ID参数")
             return jsonify({'error': '缺少用户ID'}), 400
         
-        logger.debug(f"查找用户 {user_id} 的健康数据")
-        
-        health_data = HealthData.query.filter_by(user_id=user_id).first()
+        # 先读版本号再查库：查库期间发生的写入会递增版本号，下次读取即失效
+        uid = to_int_user_id(user_id)
+        version = health_versions.get(uid) if uid is not None else None
+        entry = health_cache.get(uid, version) if uid is not None else None
         
-        if health_data:
+        if entry is None:
+            logger.debug(f"查找用户 {user_id} 的健康数据")
+            
+            health_data = HealthData.query.filter_by(user_id=user_id).first()
+            
+            if not health_data:
+                logger.warning(f"未找到用户 {user_id} 的健康数据")
+                return jsonify({'message': '未找到健康数据'}), 404
+            
             logger.info(f"找到用户 {user_id} 的健康数据")
-            return jsonify({
+            body = {
                 'name': health_data.name,
                 'gender': health_data.gender,
                 'age': health_data.age,
@@ -406,10 +507,16 @@ def get_health_data():
                 'weight': health_data.weight,
                 'blood_type': health_data.blood_type,
                 'last_update': health_data.last_update.strftime('%Y-%m-%d')
-            })
-        else:
-            logger.warning(f"未找到用户 {user_id} 的健康数据")
-            return jsonify({'message': '未找到健康数据'}), 404
+            }
+            if uid is None:
+                return jsonify(body)
+            entry = health_cache.put(uid, version, body)
+        
+        # 带 ETag 返回，客户端携带 If-None-Match 且未变化时返回 304
+        response = jsonify(entry.body)
+        response.set_etag(entry.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
             
     except Exception as e:
         logger.error(f"获取健康数据异常: {str(e)}")
@@ -459,6 +566,11 @@ def save_health_data():
         db.session.add(record)
         db.session.commit()
         
+        # 提交后递增版本号，使所有 worker 的缓存失效
+        uid = to_int_user_id(user_id)
+        if uid is not None:
+            health_versions.bump(uid)
+        
         logger.info(f"用户 {user_id} 的健康数据保存成功")
         return jsonify({
             'success': True,
@@ -478,6 +590,7 @@ def save_health_data():
 # 物联网数据接收接口 - 专门处理来自 L610 设备的数据
 @app.route('/lotdata', methods=['POST','GET'])
 @iot_signature_required # 添加鉴权装饰器
+@rate_limited(LOTDATA_LIMITER, lotdata_rate_key)
 def receive_lotdata():
     # 如果是 POST 请求，打印完整报文
     if request.method == 'POST' and DEBUG_MODE:
@@ -493,6 +606,7 @@ def receive_lotdata():
             'supported_methods': ['POST']
         })
 
+    dedup_key = None  # 已占用的去重键，处理失败时释放
     try:
         logger.debug("收到腾讯物联网平台数据")
         
@@ -529,10 +643,56 @@ def receive_lotdata():
         seq = data.get('seq', 0)
         topic = data.get('topic', '')
         
+        # 重复投递检查：同一设备的同一序列号和时间戳视为同一条消息
+        # 检查与占用是原子的，并发到达的重试只有一个会继续处理
+        data_timestamp = data['timestamp']
+        if 'seq' in data and not LOTDATA_DEDUP.reserve((device_name, seq, data_timestamp)):
+            logger.info(f"忽略设备 {device_name} 的重复消息, seq: {seq}")
+            return jsonify({
+                'success': True,
+                'message': 'Duplicate ignored',
+                'device_name': device_name,
+                'duplicate': True
+            })
+        if 'seq' in data:
+            dedup_key = (device_name, seq, data_timestamp)
+        
         # 提取核心参数 - epilepsy_state 和 location
         payload = data['payload']
         params = payload.get('params', {})
         
+        # 桌面端本地检测结果（用户ID*时间戳*状态*各类别概率）单独保存：
+        # 模型输入与开发板不同，只作参考，不覆盖开发板上报的 epilepsy_state，也不发布告警
+        desktop_detection = params.get('desktop_detection')
+        if desktop_detection is not None:
+            parts = str(desktop_detection).split('*')
+            try:
+                detection_user_id, detection_state = int(parts[0]), int(parts[2])
+                probabilities = parts[3] if len(parts) > 3 else ''
+            except (ValueError, IndexError):
+                logger.error(f"设备 {device_name} 的 desktop_detection 格式错误: {desktop_detection}")
+                if dedup_key is not None:
+                    LOTDATA_DEDUP.release(dedup_key)
+                return jsonify({'success': False, 'message': 'Invalid desktop_detection'}), 400
+            detection = DesktopDetection.query.filter_by(user_id=detection_user_id).first()
+            if detection is None:
+                detection = DesktopDetection(user_id=detection_user_id)
+                db.session.add(detection)
+            detection.device_name = device_name
+            detection.state = detection_state
+            detection.probabilities = probabilities
+            detection.timestamp = timestamp
+            detection.received_at = datetime.utcnow()
+            db.session.commit()
+            if dedup_key is not None:
+                LOTDATA_DEDUP.confirm(dedup_key)
+            logger.info(f"用户 {detection_user_id} 的桌面端检测结果: 状态 {detection_state}, 概率 {probabilities}")
+            return jsonify({
+                'success': True,
+                'message': 'Detection received',
+                'device_name': device_name
+            })
+        
         # 解析函数 - 处理 userid*时间戳*值 格式
         def parse_value(field_value):
             if not field_value:
@@ -563,13 +723,17 @@ def receive_lotdata():
         id = -1
         state = -1
         loc = None
+        state_user_id = None
+        prev_state = None
 
         if epilepsy_state is None:
             logger.warning(f"设备 {device_name} 缺少 epilepsy_state 参数")
         else:
             id,state = parse_value(epilepsy_state)
+            state_user_id = id
             data = DeviceData.query.filter_by(user_id=id).first()
             if(data):
+                prev_state = data.epilepsy_state
                 data.epilepsy_state = state
                 data.product_id=product_id
                 data.seq=seq
@@ -617,6 +781,22 @@ def receive_lotdata():
             db.session.add(new_record)
             db.session.commit()
         
+        # 写库成功后才确认，处理失败的消息释放占用，仍可由平台重试
+        if dedup_key is not None:
+            LOTDATA_DEDUP.confirm(dedup_key)
+            dedup_key = None
+        
+        # 状态由非发作变为发作时发布告警
+        if state == 1 and prev_state != 1 and state_user_id is not None:
+            alert = ALERT_BUS.publish(
+                state_user_id,
+                device_name=device_name,
+                state=state,
+                location=loc,
+                timestamp=data_timestamp
+            )
+            logger.warning(f"用户 {state_user_id} 癫痫发作告警已发布, 告警ID: {alert['id']}")
+        
         logger.info(f"成功接收设备 {device_name} 的数据")
         logger.debug(f"epilepsy_state: {epilepsy_state}, location: {location}")
         
@@ -629,6 +809,8 @@ def receive_lotdata():
     except Exception as e:
         logger.error(f"处理物联网数据异常: {str(e)}")
         db.session.rollback()
+        if dedup_key is not None:
+            LOTDATA_DEDUP.release(dedup_key)
         return jsonify({
             'success': False,
             'message': 'Server error'
@@ -685,6 +867,78 @@ def bind_device():
             'message': 'Server error'
         }), 500
         
+def format_sse(alert):
+    """将告警编码为 SSE 事件"""
+    return f"id: {alert['id']}\nevent: seizure\ndata: {json.dumps(alert, ensure_ascii=False)}\n\n"
+
+# 告警推送接口（SSE），断线重连时通过 Last-Event-ID 补发错过的告警
+@app.route('/api/alerts/stream', methods=['GET'])
+def alert_stream():
+    user_id = to_int_user_id(request.args.get('user_id'))
+    if user_id is None:
+        return jsonify({'success': False, 'message': '缺少用户ID'}), 400
+    
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    last_id = to_int_user_id(last_id)
+    subscriber = ALERT_BUS.subscribe(user_id, last_id)
+    logger.info(f"用户 {user_id} 订阅告警推送, Last-Event-ID: {last_id}")
+    
+    def generate():
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                alert = subscriber.get(ALERT_HEARTBEAT_INTERVAL)
+                if alert is None:
+                    # 心跳注释，保持连接并及时发现断开
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(alert)
+        finally:
+            ALERT_BUS.unsubscribe(subscriber)
+            logger.info(f"用户 {user_id} 的告警推送连接已关闭")
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 关闭 nginx 缓冲，保证即时送达
+    })
+
+# 告警长轮询接口（供不支持 SSE 的客户端，如微信小程序）
+@app.route('/api/alerts/poll', methods=['GET'])
+def alert_poll():
+    user_id = to_int_user_id(request.args.get('user_id'))
+    if user_id is None:
+        return jsonify({'success': False, 'message': '缺少用户ID'}), 400
+    
+    since = to_int_user_id(request.args.get('since')) or 0
+    try:
+        timeout = float(request.args.get('timeout', 25))
+    except ValueError:
+        timeout = math.nan
+    if not math.isfinite(timeout):
+        return jsonify({'success': False, 'message': 'timeout 参数无效'}), 400
+    timeout = min(max(timeout, 0.0), 60.0)
+    alerts = ALERT_BUS.wait(user_id, since, timeout)
+    
+    return jsonify({
+        'success': True,
+        'alerts': alerts,
+        'last_id': alerts[-1]['id'] if alerts else since
+    })
+
+# 数据接收统计接口（限流等计数）
+@app.route('/api/ingest-stats', methods=['GET'])
+def ingest_stats():
+    return jsonify({
+        'success': True,
+        'rate_limit': {
+            'lotdata': LOTDATA_LIMITER.stats(),
+            'realtime_upload_waveform': WAVEFORM_UPLOAD_LIMITER.stats()
+        },
+        'lotdata_dedup': LOTDATA_DEDUP.stats(),
+        'health_cache': health_cache.stats(),
+        'alerts': ALERT_BUS.stats()
+    })
+
 # 错误处理
 @app.errorhandler(404)
 def not_found_error(error):
@@ -832,6 +1086,7 @@ class EEGWaveformQueue(db.Model):
 # 更新上传接口 - 实现环形队列
 @app.route('/realtime-upload-waveform', methods=['POST'])
 @iot_signature_required
+@rate_limited(WAVEFORM_UPLOAD_LIMITER, waveform_rate_key)
 def realtime_upload_waveform():
     try:
         data = request.json
@@ -870,6 +1125,11 @@ def realtime_upload_waveform():
         db.session.commit()
         logger.info(f"添加用户 {user_id} 的脑电波形图到队列，序列ID: {next_id}")
         
+        # 同步发布到共享帧存储，供所有 worker 无需查库即可读取
+        uid = to_int_user_id(user_id)
+        if uid is None or not frame_store.publish(uid, waveform_base64.encode('ascii'), time.time()):
+            logger.warning(f"用户 {user_id} 的波形图未写入共享帧存储")
+        
         return jsonify({
             'success': True,
             'message': '波形图上传成功',
@@ -883,6 +1143,32 @@ def realtime_upload_waveform():
             'message': '服务器内部错误'
         }), 500
 
+# 桌面端本地检测结果查询接口
+@app.route('/api/desktop-detection', methods=['GET'])
+def get_desktop_detection():
+    try:
+        user_id = request.args.get('user_id')
+        if not user_id:
+            return jsonify({'success': False, 'message': '缺少用户ID'}), 400
+        
+        detection = DesktopDetection.query.filter_by(user_id=user_id).first()
+        if not detection:
+            return jsonify({'success': False, 'message': '未找到桌面端检测结果'}), 404
+        
+        return jsonify({
+            'success': True,
+            'state': detection.state,
+            'probabilities': [float(p) for p in detection.probabilities.split(',')] if detection.probabilities else [],
+            'timestamp': detection.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        })
+        
+    except Exception as e:
+        logger.error(f"获取桌面端检测结果异常: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': '服务器内部错误'
+        }), 500
+
 # 更新获取接口 - 返回最新图像并清理旧图
 @app.route('/api/get-latest-waveform', methods=['GET'])
 def get_latest_waveform():
@@ -891,6 +1177,17 @@ def get_latest_waveform():
         if not user_id:
             return jsonify({'success': False, 'message': '缺少用户ID'}), 400
         
+        # 优先从共享帧存储读取，命中时不访问数据库
+        uid = to_int_user_id(user_id)
+        frame = frame_store.read(uid) if uid is not None else None
+        if frame:
+            payload, timestamp = frame
+            return jsonify({
+                'success': True,
+                'waveform_data': payload.decode('ascii'),
+                'created_at': datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            })
+        
         # 获取用户最新的波形图记录
         waveform = EEGWaveformQueue.query.filter_by(user_id=user_id)\
             .order_by(EEGWaveformQueue.sequence_id.desc()).first()
@@ -934,6 +1231,10 @@ def clean_waveform():
         deleted_count = EEGWaveformQueue.query.filter_by(user_id=user_id).delete()
         db.session.commit()
         
+        uid = to_int_user_id(user_id)
+        if uid is not None:
+            frame_store.clear(uid)
+        
         logger.info(f"清理用户 {user_id} 的脑电波形图，删除记录数: {deleted_count}")
         
         return jsonify({
@@ -0,0 +1,110 @@
+"""
+告警端到端延迟基准测试
+
+向运行中的服务器发送 /lotdata 消息，使 epilepsy_state 在 0 与 1 之间切换，
+同时通过 /api/alerts/stream 订阅告警，统计从 POST 发出到订阅端收到告警的延迟。
+
+用法:
+    python app.py &
+    python bench_alerts.py --url http://localhost:5000 --user-id 1 --rounds 20
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+
+import requests
+
+IOT_PLATFORM_TOKEN = "njunju"
+
+
+def sign_headers():
+    """生成与 iot_signature_required 一致的签名头"""
+    timestamp = str(int(time.time()))
+    nonce = str(random.randint(100000, 999999))
+    params = sorted([IOT_PLATFORM_TOKEN, timestamp, nonce])
+    signature = hashlib.sha1(''.join(params).encode('utf-8')).hexdigest()
+    return {'Signature': signature, 'Timestamp': timestamp, 'Nonce': nonce,
+            'Content-Type': 'application/json'}
+
+
+def post_state(session, url, user_id, state, seq):
+    now = int(time.time())
+    message = {
+        'devicename': 'bench_device',
+        'productid': 'bench',
+        'seq': seq,
+        'timestamp': now,
+        'topic': 'bench',
+        'payload': {'params': {'epilepsy_state': f"{user_id}*{now}*{state}"}}
+    }
+    response = session.post(f"{url}/lotdata", data=json.dumps(message), headers=sign_headers(), timeout=5)
+    response.raise_for_status()
+
+
+def listen(url, user_id, received, ready, stop):
+    """读取 SSE 流，记录每条告警的到达时间"""
+    with requests.get(f"{url}/api/alerts/stream", params={'user_id': user_id},
+                      stream=True, timeout=(5, 30)) as response:
+        ready.set()
+        for line in response.iter_lines(decode_unicode=True):
+            if stop.is_set():
+                break
+            if line and line.startswith('data:'):
+                alert = json.loads(line[5:])
+                received.append((time.perf_counter(), alert))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='告警端到端延迟基准测试')
+    parser.add_argument('--url', default='http://localhost:5000', help='服务器地址')
+    parser.add_argument('--user-id', type=int, default=1, help='告警所属用户ID')
+    parser.add_argument('--rounds', type=int, default=20, help='发作告警次数')
+    parser.add_argument('--interval', type=float, default=1.1, help='两次状态上报的间隔 (秒)，需满足服务器限流')
+    args = parser.parse_args()
+
+    received, ready, stop = [], threading.Event(), threading.Event()
+    listener = threading.Thread(target=listen, args=(args.url, args.user_id, received, ready, stop), daemon=True)
+    listener.start()
+    ready.wait(5)
+    time.sleep(0.2)
+
+    session = requests.Session()
+    seq = random.randint(1, 1 << 30)
+    latencies = []
+    for _ in range(args.rounds):
+        # 先复位为 0，再切换为 1 触发告警
+        seq += 1
+        post_state(session, args.url, args.user_id, 0, seq)
+        time.sleep(args.interval)
+
+        count = len(received)
+        seq += 1
+        sent_at = time.perf_counter()
+        post_state(session, args.url, args.user_id, 1, seq)
+        deadline = time.time() + 5
+        while len(received) == count and time.time() < deadline:
+            time.sleep(0.0005)
+        if len(received) > count:
+            latencies.append((received[count][0] - sent_at) * 1000)
+        else:
+            print("警告：5秒内未收到告警")
+        time.sleep(args.interval)
+
+    stop.set()
+    if latencies:
+        print(f"告警次数: {len(latencies)}/{args.rounds}")
+        print(f"POST→订阅端延迟 p50: {percentile(latencies, 0.5):.2f}ms, "
+              f"p95: {percentile(latencies, 0.95):.2f}ms, max: {max(latencies):.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
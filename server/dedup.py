@@ -0,0 +1,162 @@
+"""
+物联网数据去重
+
+物联网平台会重试投递，同一条消息可能多次到达 /lotdata。这里按
+(设备名, 序列号, 设备时间戳) 记录近期已处理的消息，重复消息直接确认而不写数据库。
+
+检查与登记必须是原子的：平台并发重试时，两次投递若都先“检查不存在”再各自写库，
+仍会重复写入。因此接口为：
+- reserve(key)：在锁内检查并占用，返回 True 表示首次出现、由调用方处理
+- confirm(key)：写库成功后确认
+- release(key)：写库失败时释放，平台重试的同一消息可再次处理
+
+提供两种实现：
+- WindowedSeqSet：精确集合，按时间窗口过期并限制条目数
+- BloomSeqSet：双代布隆过滤器，内存固定，适合大规模设备；存在极低概率误判为重复
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class WindowedSeqSet:
+    """有界、按时间窗口过期的精确去重集合"""
+
+    def __init__(self, window=600.0, max_entries=100000):
+        """
+        :param window: 记录保留时间 (秒)
+        :param max_entries: 最大条目数，超过时淘汰最早记录
+        """
+        self.window = window
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.duplicates = 0
+
+    def _expire(self, now):
+        """淘汰过期条目（调用方持有锁），条目按插入时间有序"""
+        entries = self._entries
+        while entries:
+            added_at = next(iter(entries.values()))
+            if now - added_at < self.window and len(entries) <= self.max_entries:
+                break
+            entries.popitem(last=False)
+
+    def reserve(self, key):
+        """
+        原子地检查并占用消息
+        :return: 首次出现返回True；已处理或正在处理返回False
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self.checked += 1
+            if key in self._entries:
+                self.duplicates += 1
+                return False
+            self._entries[key] = now
+            return True
+
+    def confirm(self, key):
+        """消息已写库（精确集合在 reserve 时已记录）"""
+
+    def release(self, key):
+        """写库失败时释放占用"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': 'exact',
+                'entries': len(self._entries),
+                'checked': self.checked,
+                'duplicates': self.duplicates
+            }
+
+
+class BloomSeqSet:
+    """
+    双代布隆过滤器去重集合
+    每半个窗口轮换一次：旧代丢弃，当前代变为旧代，查询同时检查两代，
+    因此记录至少保留半个窗口、至多保留一个窗口。
+    """
+
+    def __init__(self, window=600.0, capacity=1000000, hashes=7):
+        """
+        :param window: 记录保留时间 (秒)
+        :param capacity: 每代预计容纳的条目数
+        :param hashes: 哈希函数个数
+        """
+        self.window = window
+        self.hashes = hashes
+        # 每条目约 10 位，k=7 时误判率约 1%
+        self.bits = max(64, capacity * 10)
+        self._current = bytearray(self.bits // 8 + 1)
+        self._previous = bytearray(self.bits // 8 + 1)
+        self._rotated_at = time.monotonic()
+        self._pending = set()  # 已占用、尚未确认的消息（布隆过滤器无法删除，确认后才写入）
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.duplicates = 0
+
+    def _positions(self, key):
+        """双重哈希生成 k 个比特位置"""
+        digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def _rotate(self, now):
+        if now - self._rotated_at >= self.window / 2:
+            self._previous = self._current
+            self._current = bytearray(len(self._previous))
+            self._rotated_at = now
+
+    @staticmethod
+    def _test(bits, positions):
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def reserve(self, key):
+        positions = self._positions(key)
+        with self._lock:
+            self._rotate(time.monotonic())
+            self.checked += 1
+            if (key in self._pending or self._test(self._current, positions)
+                    or self._test(self._previous, positions)):
+                self.duplicates += 1
+                return False
+            self._pending.add(key)
+            return True
+
+    def confirm(self, key):
+        positions = self._positions(key)
+        with self._lock:
+            self._pending.discard(key)
+            self._rotate(time.monotonic())
+            for p in positions:
+                self._current[p >> 3] |= 1 << (p & 7)
+
+    def release(self, key):
+        with self._lock:
+            self._pending.discard(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': 'bloom',
+                'bits': self.bits,
+                'checked': self.checked,
+                'duplicates': self.duplicates
+            }
+
+
+def create_deduplicator(mode='exact', window=600.0, capacity=100000):
+    """根据配置创建去重集合"""
+    if mode == 'bloom':
+        return BloomSeqSet(window=window, capacity=capacity)
+    return WindowedSeqSet(window=window, max_entries=capacity)
+
@@ -0,0 +1,222 @@
+"""
+跨进程共享的“每用户最新波形帧”存储
+
+服务器以多个 worker 进程运行时，进程内缓存彼此独立且不一致，而每次轮询都回落到
+SQLite 又失去了缓存的意义。本模块把最新帧放在一个内存映射文件（mmap）组成的
+共享内存块中：
+
+    [文件头 32B][索引区 slots*8B][槽位0: 槽头 32B + 数据 slot_size B][槽位1] ...
+
+- 索引区：每个槽位对应的 user_id（0 表示空），按 user_id 取模线性探测
+- 槽头：seq(序列号) user_id length timestamp，采用 seqlock 版本控制
+  写入者先把 seq 置为奇数，写完数据后再置为偶数；读取者读取前后两次 seq
+  一致且为偶数时才认为数据完整，否则重试
+- 写入者之间通过 fcntl.flock + 线程锁互斥；读取者无锁，不访问数据库，
+  也不经过 pickle，只做一次内存拷贝
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+
+MAGIC = b'EPFS'
+LAYOUT_VERSION = 1
+
+# 文件头: magic, 布局版本, 槽位数, 单槽数据容量
+_FILE_HEADER = struct.Struct('<4sIII')
+_FILE_HEADER_SIZE = 32
+# 索引项: user_id
+_INDEX_ENTRY = struct.Struct('<q')
+# 槽头: seq, user_id, 数据长度, 保留, 时间戳
+_SLOT_HEADER = struct.Struct('<QqIId')
+_SEQ = struct.Struct('<Q')
+
+EMPTY_USER = 0
+READ_RETRIES = 100
+
+
+class SharedFrameStore:
+    """基于内存映射文件的跨进程最新帧存储"""
+
+    def __init__(self, path, slots=64, slot_size=1 << 20):
+        """
+        :param path: 共享文件路径（所有 worker 使用同一路径）
+        :param slots: 槽位数量，即可同时缓存的用户数
+        :param slot_size: 单帧最大字节数，超过则不缓存
+        """
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self._thread_lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._mm = None
+        self._open()
+
+    # ---------- 文件与映射管理 ----------
+    def _open(self):
+        """打开（必要时创建）共享文件并建立映射，每个进程各自持有文件描述符"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size >= _FILE_HEADER_SIZE:
+                magic, version, slots, slot_size = _FILE_HEADER.unpack(
+                    os.pread(fd, _FILE_HEADER.size, 0))
+                if magic != MAGIC or version != LAYOUT_VERSION:
+                    raise ValueError(f"共享帧文件格式不匹配: {self.path}")
+                # 以已存在文件的布局为准，保证所有进程看到同一布局
+                self.slots, self.slot_size = slots, slot_size
+            else:
+                total = self._total_size(self.slots, self.slot_size)
+                os.ftruncate(fd, total)
+                os.pwrite(fd, _FILE_HEADER.pack(MAGIC, LAYOUT_VERSION, self.slots, self.slot_size), 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+        self._fd = fd
+        self._mm = mmap.mmap(fd, self._total_size(self.slots, self.slot_size))
+        self._pid = os.getpid()
+
+    def _ensure_process(self):
+        """fork 后子进程继承的文件描述符与父进程共享 flock，需要重新打开"""
+        if self._pid != os.getpid():
+            self._mm = None
+            self._fd = None
+            self._open()
+
+    @staticmethod
+    def _total_size(slots, slot_size):
+        return _FILE_HEADER_SIZE + slots * _INDEX_ENTRY.size + slots * (_SLOT_HEADER.size + slot_size)
+
+    def _index_offset(self, slot):
+        return _FILE_HEADER_SIZE + slot * _INDEX_ENTRY.size
+
+    def _slot_offset(self, slot):
+        base = _FILE_HEADER_SIZE + self.slots * _INDEX_ENTRY.size
+        return base + slot * (_SLOT_HEADER.size + self.slot_size)
+
+    def close(self):
+        """关闭映射和文件"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    # ---------- 槽位查找 ----------
+    def _find_slot(self, user_id):
+        """线性探测查找用户所在槽位，未找到返回 None"""
+        mm = self._mm
+        start = user_id % self.slots
+        for i in range(self.slots):
+            slot = (start + i) % self.slots
+            owner = _INDEX_ENTRY.unpack_from(mm, self._index_offset(slot))[0]
+            if owner == user_id:
+                return slot
+            if owner == EMPTY_USER:
+                return None
+        return None
+
+    def _claim_slot(self, user_id):
+        """为新用户分配槽位（调用方持有写锁）；表满时复用最久未更新的槽位"""
+        mm = self._mm
+        start = user_id % self.slots
+        oldest_slot, oldest_ts = start, None
+        for i in range(self.slots):
+            slot = (start + i) % self.slots
+            owner = _INDEX_ENTRY.unpack_from(mm, self._index_offset(slot))[0]
+            if owner == user_id:
+                return slot
+            if owner == EMPTY_USER:
+                _INDEX_ENTRY.pack_into(mm, self._index_offset(slot), user_id)
+                return slot
+            ts = _SLOT_HEADER.unpack_from(mm, self._slot_offset(slot))[4]
+            if oldest_ts is None or ts < oldest_ts:
+                oldest_slot, oldest_ts = slot, ts
+        # 原地替换不会产生空槽，其他用户的探测链保持完整
+        _INDEX_ENTRY.pack_into(mm, self._index_offset(oldest_slot), user_id)
+        return oldest_slot
+
+    # ---------- 读写接口 ----------
+    def publish(self, user_id, payload, timestamp=None):
+        """
+        发布用户的最新帧
+        :param user_id: 整数用户ID
+        :param payload: 帧数据 (bytes)
+        :param timestamp: 帧时间戳 (秒)，默认当前时间
+        :return: 写入成功返回True；帧过大或ID非法返回False
+        """
+        if user_id <= EMPTY_USER or len(payload) > self.slot_size:
+            return False
+        if timestamp is None:
+            timestamp = time.time()
+
+        self._ensure_process()
+        mm = self._mm
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                slot = self._claim_slot(user_id)
+                offset = self._slot_offset(slot)
+                seq = _SEQ.unpack_from(mm, offset)[0]
+                # 置为奇数：写入进行中
+                _SEQ.pack_into(mm, offset, seq + 1)
+                _SLOT_HEADER.pack_into(mm, offset, seq + 1, user_id, len(payload), 0, timestamp)
+                data_offset = offset + _SLOT_HEADER.size
+                mm[data_offset:data_offset + len(payload)] = payload
+                # 置为偶数：写入完成
+                _SEQ.pack_into(mm, offset, seq + 2)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return True
+
+    def clear(self, user_id):
+        """清除用户的最新帧（槽位保留，长度置0）"""
+        self._ensure_process()
+        mm = self._mm
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                slot = self._find_slot(user_id)
+                if slot is None:
+                    return
+                offset = self._slot_offset(slot)
+                seq = _SEQ.unpack_from(mm, offset)[0]
+                _SEQ.pack_into(mm, offset, seq + 1)
+                _SLOT_HEADER.pack_into(mm, offset, seq + 1, user_id, 0, 0, 0.0)
+                _SEQ.pack_into(mm, offset, seq + 2)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def read(self, user_id):
+        """
+        读取用户的最新帧（无锁）
+        :return: (payload_bytes, timestamp)，不存在时返回None
+        """
+        self._ensure_process()
+        mm = self._mm
+        slot = self._find_slot(user_id)
+        if slot is None:
+            return None
+
+        offset = self._slot_offset(slot)
+        data_offset = offset + _SLOT_HEADER.size
+        for _ in range(READ_RETRIES):
+            seq1, owner, length, _, timestamp = _SLOT_HEADER.unpack_from(mm, offset)
+            if seq1 & 1:
+                # 写入进行中，让出CPU后重试
+                time.sleep(0)
+                continue
+            if owner != user_id or length == 0 or length > self.slot_size:
+                # 槽位已被其他用户复用或帧已清除
+                return None
+            payload = mm[data_offset:data_offset + length]
+            seq2 = _SEQ.unpack_from(mm, offset)[0]
+            if seq1 == seq2:
+                return payload, timestamp
+        return None
+
@@ -0,0 +1,119 @@
+"""
+健康数据读穿缓存
+
+个人页每次展示都会请求 /health-data，而健康档案很少变化。这里为每个 worker
+维护一个有界 LRU 缓存，缓存项带有版本号；版本号保存在所有 worker 共享的
+内存映射文件中，save_health_data() 提交后递增对应用户的版本号，
+其他 worker 下次读取时发现版本不一致即重新查库。
+"""
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict, namedtuple
+
+_COUNTER = struct.Struct('<Q')
+
+CacheEntry = namedtuple('CacheEntry', ['version', 'body', 'etag'])
+
+
+class VersionTable:
+    """跨进程共享的用户版本号表（user_id 取模映射，冲突只会导致多余的失效）"""
+
+    def __init__(self, path, size=4096):
+        """
+        :param path: 共享文件路径
+        :param size: 计数器个数
+        """
+        self.path = path
+        self.size = size
+        self._thread_lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._mm = None
+        self._open()
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            current = os.fstat(fd).st_size
+            if current < self.size * _COUNTER.size:
+                os.ftruncate(fd, self.size * _COUNTER.size)
+            else:
+                # 以已存在文件的大小为准
+                self.size = current // _COUNTER.size
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._mm = mmap.mmap(fd, self.size * _COUNTER.size)
+        self._pid = os.getpid()
+
+    def _ensure_process(self):
+        """fork 后重新打开文件，避免与父进程共享 flock"""
+        if self._pid != os.getpid():
+            self._open()
+
+    def get(self, user_id):
+        """读取用户当前版本号"""
+        self._ensure_process()
+        return _COUNTER.unpack_from(self._mm, (user_id % self.size) * _COUNTER.size)[0]
+
+    def bump(self, user_id):
+        """递增用户版本号，使所有 worker 中的缓存失效"""
+        self._ensure_process()
+        offset = (user_id % self.size) * _COUNTER.size
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                version = _COUNTER.unpack_from(self._mm, offset)[0] + 1
+                _COUNTER.pack_into(self._mm, offset, version)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return version
+
+
+class HealthDataCache:
+    """按用户缓存健康数据响应体的有界 LRU 缓存"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, version):
+        """版本号一致时返回缓存项，否则返回None"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry
+
+    def put(self, user_id, version, body):
+        """写入缓存项并计算 ETag"""
+        raw = json.dumps(body, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        etag = hashlib.sha1(raw).hexdigest()[:16]
+        entry = CacheEntry(version, body, etag)
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
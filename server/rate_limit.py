@@ -0,0 +1,93 @@
+"""
+令牌桶限流
+
+按设备名 / 用户ID 维护令牌桶，防止异常的 L610 开发板或陷入重试循环的电脑端
+把数据接收接口打满。桶表为普通字典（键 -> [令牌数, 上次更新时间]），
+长时间空闲的桶会被定期清理：空闲足够久的桶必然已经补满，删除后重建等价。
+"""
+
+import math
+import threading
+import time
+
+
+class TokenBucketLimiter:
+    """线程安全的令牌桶限流表"""
+
+    def __init__(self, rate, burst, idle_ttl=300.0, max_keys=10000, sweep_interval=60.0):
+        """
+        :param rate: 令牌补充速率 (个/秒)
+        :param burst: 桶容量，即允许的突发请求数
+        :param idle_ttl: 空闲多久 (秒) 后清理该键
+        :param max_keys: 表项上限，超过时立即触发清理
+        :param sweep_interval: 定期清理间隔 (秒)
+        """
+        self.rate = float(rate)
+        self.burst = float(burst)
+        # 空闲时间不短于补满整桶所需时间，保证清理不改变限流结果
+        self.idle_ttl = max(float(idle_ttl), self.burst / self.rate)
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+        # 统计计数
+        self.allowed = 0
+        self.throttled = 0
+        self.evicted = 0
+
+    def acquire(self, key, cost=1.0):
+        """
+        尝试为指定键消耗令牌
+        :return: (是否放行, 建议重试等待秒数)
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._sweep(now)
+                bucket = [self.burst, now]
+                self._buckets[key] = bucket
+            else:
+                # 按流逝时间补充令牌
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self.allowed += 1
+                return True, 0.0
+
+            self.throttled += 1
+            return False, (cost - bucket[0]) / self.rate
+
+    def _sweep(self, now):
+        """清理空闲桶（调用方持有锁）"""
+        idle = [key for key, (_, last) in self._buckets.items() if now - last >= self.idle_ttl]
+        for key in idle:
+            del self._buckets[key]
+        self.evicted += len(idle)
+        self._last_sweep = now
+
+    def stats(self):
+        """返回限流统计信息"""
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'active_keys': len(self._buckets),
+                'allowed': self.allowed,
+                'throttled': self.throttled,
+                'evicted': self.evicted
+            }
+
+
+def retry_after_header(seconds):
+    """把等待秒数转换为 Retry-After 头的整数秒"""
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 服务器模块为平铺结构（from frame_store import ...），测试时把 server 目录加入导入路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,81 @@
+"""
+SharedFrameStore 多进程并发测试：多个写进程与读进程同时访问同一存储，
+读到的每一帧都必须完整（没有撕裂）且属于所读的用户（没有串帧）。
+"""
+
+import multiprocessing
+import os
+import struct
+import time
+
+from frame_store import SharedFrameStore
+
+USERS = list(range(1, 9))
+
+
+def _make_frame(writer_id, counter, user_id, size):
+    """生成可自校验的帧：头部记录写入者、计数和用户，正文为由三者决定的重复字节"""
+    fill = bytes([(writer_id * 31 + counter * 7 + user_id) % 251]) * size
+    return struct.pack('<III', writer_id, counter, user_id) + fill
+
+
+def _check_frame(payload, user_id):
+    """
+    :return: 'ok'、'torn'（正文不一致）或 'mixed'（属于其他用户）
+    """
+    writer_id, counter, owner = struct.unpack_from('<III', payload)
+    if owner != user_id:
+        return 'mixed'
+    expected = bytes([(writer_id * 31 + counter * 7 + owner) % 251])
+    return 'ok' if payload[12:] == expected * (len(payload) - 12) else 'torn'
+
+
+def _writer_proc(path, writer_id, rounds):
+    store = SharedFrameStore(path)
+    for counter in range(rounds):
+        for user_id in USERS:
+            size = 1000 + (counter * 7919 + user_id) % 50000
+            store.publish(user_id, _make_frame(writer_id, counter, user_id, size))
+    store.close()
+
+
+def _reader_proc(path, duration, result_queue):
+    store = SharedFrameStore(path)
+    counts = {'ok': 0, 'torn': 0, 'mixed': 0}
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        for user_id in USERS:
+            frame = store.read(user_id)
+            if frame is not None:
+                counts[_check_frame(frame[0], user_id)] += 1
+    store.close()
+    result_queue.put(counts)
+
+
+def test_concurrent_writers_and_readers(tmp_path, writers=4, readers=4, rounds=200):
+    path = os.path.join(tmp_path, 'frames.bin')
+    SharedFrameStore(path, slots=16, slot_size=64 * 1024).close()
+
+    result_queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_writer_proc, args=(path, w, rounds)) for w in range(writers)]
+    procs += [multiprocessing.Process(target=_reader_proc, args=(path, 2.0, result_queue))
+              for _ in range(readers)]
+    for p in procs:
+        p.start()
+    results = [result_queue.get(timeout=60) for _ in range(readers)]
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+
+    assert sum(r['ok'] for r in results) > 0
+    assert sum(r['torn'] for r in results) == 0
+    assert sum(r['mixed'] for r in results) == 0
+
+    store = SharedFrameStore(path)
+    try:
+        for user_id in USERS:
+            frame = store.read(user_id)
+            assert frame is not None
+            assert _check_frame(frame[0], user_id) == 'ok'
+    finally:
+        store.close()
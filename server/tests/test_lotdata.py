@@ -0,0 +1,56 @@
+"""
+/lotdata 接口测试：平台重复投递同一条消息时只写一条记录
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    """在临时目录中使用独立的数据库与共享内存文件导入 app"""
+    tmp = tmp_path_factory.mktemp('server')
+    os.environ['DATABASE_URL'] = f"sqlite:///{tmp / 'health_data.db'}"
+    os.environ['FRAME_STORE_PATH'] = str(tmp / 'latest_frames.bin')
+    os.environ['HEALTH_VERSION_PATH'] = str(tmp / 'health_versions.bin')
+    argv = sys.argv
+    sys.argv = ['app']  # app 在导入时解析命令行参数
+    try:
+        app_module = importlib.import_module('app')
+    finally:
+        sys.argv = argv
+    with app_module.app.app_context():
+        app_module.db.create_all()
+    return app_module
+
+
+def _headers(token):
+    timestamp, nonce = str(int(time.time())), 'nonce'
+    signature = hashlib.sha1(''.join(sorted([token, timestamp, nonce])).encode('utf-8')).hexdigest()
+    return {'Signature': signature, 'Timestamp': timestamp, 'Nonce': nonce}
+
+
+def test_duplicate_delivery_written_once(server):
+    client = server.app.test_client()
+    timestamp = int(time.time())
+    message = json.dumps({
+        'devicename': 'L610_dedup',
+        'timestamp': timestamp,
+        'seq': 42,
+        'payload': {'params': {'epilepsy_state': f"9001*{timestamp}*0", 'location': f"9001*{timestamp}*here"}}
+    })
+
+    replies = [client.post('/lotdata', data=message, headers=_headers(server.IOT_PLATFORM_TOKEN))
+               for _ in range(4)]
+
+    assert all(r.status_code == 200 for r in replies)
+    assert not replies[0].get_json().get('duplicate')
+    assert all(r.get_json().get('duplicate') is True for r in replies[1:])
+    with server.app.app_context():
+        assert server.DeviceData.query.filter_by(device_name='L610_dedup').count() == 1